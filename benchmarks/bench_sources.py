@@ -0,0 +1,127 @@
+import argparse
+import multiprocessing
+import resource
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from benchmarks.mock_picsum import MockPicsum, render_image
+
+
+def run_picsum(cache_home: str, port: int, images: int, options: dict) -> dict:
+    # Runs in a fresh process, so the peak memory is its own
+    from themur.source import PicsumLorem
+    source = PicsumLorem(cache_home, host='127.0.0.1', port=port, scheme='http')
+    return _measure(lambda: source.get_img(**options), images)
+
+
+def run_local(root: str, cache_home: str, images: int, options: dict) -> dict:
+    from themur.source import LocalSource
+    source = LocalSource(root, cache_home)
+    return _measure(lambda: source.get_img(**options), images)
+
+
+def _measure(get_img, images: int) -> dict:
+    latencies = []
+    tracemalloc.start()
+    for _ in range(images):
+        start = time.perf_counter()
+        img, _, _ = get_img()
+        # Sources open images lazily, so include decoding them
+        img.load()
+        latencies.append(time.perf_counter() - start)
+    _, py_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'latencies': latencies,
+        'py_peak': py_peak,
+        # In KiB on Linux
+        'max_rss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+    }
+
+
+def make_tree(root: Path, files: int, size: tuple[int, int], distinct: int = 8) -> Path:
+    """
+    Create a synthetic image library of nested directories.
+
+    Only a few distinct images get encoded, the rest are copies of their bytes, so large trees are quick to create.
+    """
+    if root.is_dir() and len(list(root.rglob('*.jpg'))) == files:
+        return root
+    encoded = [render_image(i, *size, False) for i in range(min(files, distinct))]
+    for i in range(files):
+        fp = root / f"{i % 10}" / f"{i // 10 % 10}" / f"img_{i}.jpg"
+        fp.parent.mkdir(parents=True, exist_ok=True)
+        fp.write_bytes(encoded[i % len(encoded)])
+    return root
+
+
+def report(name: str, result: dict, server: MockPicsum = None) -> str:
+    latencies = sorted(result['latencies'])
+    images = len(latencies)
+    line = (f"{name:<32} p50 {statistics.median(latencies) * 1000:8.1f} ms"
+            f"  p95 {latencies[min(images - 1, int(images * 0.95))] * 1000:8.1f} ms"
+            f"  mean {statistics.fmean(latencies) * 1000:8.1f} ms")
+    if server is not None:
+        line += (f"  {server.requests / images:5.2f} req/img  {server.bytes_sent / images / 1024:8.1f} KiB/img"
+                 f"  {server.errors} errors")
+    line += f"  py peak {result['py_peak'] / 2 ** 20:7.1f} MiB  max RSS {result['max_rss'] / 2 ** 20:7.1f} MiB"
+    return line
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the image sources offline')
+    parser.add_argument('--images', help='Images to get per scenario', type=int, default=20)
+    parser.add_argument('--size', help='Size of the requested images', type=int, nargs=2, default=(1920, 1080))
+    parser.add_argument('--latency', help='Seconds the mock server waits per request', type=float, default=0.05)
+    parser.add_argument('--bandwidth', help='Bytes per second the mock server sends', type=float, default=None)
+    parser.add_argument('--error-rate', help='Share of requests the mock server fails', type=float, default=0.0)
+    parser.add_argument('--trees', help='Sizes of the synthetic local libraries', type=int, nargs='*',
+                        default=[10, 1000, 10000])
+    parser.add_argument('--tree-dir', help='Where to keep the synthetic local libraries', type=Path,
+                        default=Path(tempfile.gettempdir()) / 'themur-bench')
+    parser.add_argument('--output', help='File to also write the report to', type=Path)
+    args = parser.parse_args()
+    width, height = args.size
+    lines = []
+
+    def emit(line: str):
+        print(line)
+        lines.append(line)
+
+    # A fresh process per scenario, so peak memory is not carried over
+    ctx = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(1, mp_context=ctx, max_tasks_per_child=1) as pool:
+        server = MockPicsum(latency=args.latency, bandwidth=args.bandwidth, error_rate=args.error_rate)
+        server.serve_in_background()
+        try:
+            with tempfile.TemporaryDirectory() as cache_home:
+                scenarios = [
+                    ('picsum cold', {'width': width, 'height': height}),
+                    ('picsum warm (same id)', {'picsum_id': '1', 'width': width, 'height': height}),
+                    ('picsum full + fit', {'fit': (width, height)}),
+                ]
+                for name, options in scenarios:
+                    server.reset_counters()
+                    result = pool.submit(run_picsum, cache_home, server.server_port, args.images, options).result()
+                    emit(report(name, result, server))
+        finally:
+            server.shutdown()
+            server.server_close()
+        for files in args.trees:
+            root = make_tree(args.tree_dir / f"local_{files}", files, (width, height))
+            with tempfile.TemporaryDirectory() as cache_home:
+                for name, options in [(f"local {files} files", {}),
+                                      (f"local {files} files + fit", {'fit': (width // 2, height // 2)})]:
+                    result = pool.submit(run_local, str(root), cache_home, args.images, options).result()
+                    emit(report(name, result))
+    if args.output is not None:
+        args.output.write_text('\n'.join(lines) + '\n')
+
+
+if __name__ == '__main__':
+    sys.exit(main())
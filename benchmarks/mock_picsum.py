@@ -0,0 +1,218 @@
+import argparse
+import io
+import json
+import random
+import re
+import threading
+import time
+from functools import lru_cache
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+import PIL.Image as PImage
+import numpy as np
+
+
+class MockPicsum(ThreadingHTTPServer):
+    """
+    Offline stand-in for the Picsum Lorem API with configurable latency, bandwidth and errors
+
+    Serves the list, info and image endpoints used by `PicsumLorem` with synthetic images, and counts the requests and
+    bytes it served, so benchmarks and tests neither depend on nor get distorted by the network.
+    """
+    daemon_threads = True
+    images: int
+    full_size: tuple[int, int]
+    latency: float
+    bandwidth: float | None
+    error_rate: float
+    requests: int
+    bytes_sent: int
+    errors: int
+    _counter_lock: threading.Lock
+    _random: random.Random
+
+    def __init__(self, address: tuple[str, int] = ('127.0.0.1', 0), images: int = 100,
+                 full_size: tuple[int, int] = (1920, 1280), latency: float = 0.0, bandwidth: float = None,
+                 error_rate: float = 0.0, seed: int = 0):
+        """
+        :param address: The address to listen on (default: a free port on localhost)
+        :type address: tuple[str, int]
+        :param images: The number of images in the catalogue
+        :type images: int
+        :param full_size: The size of the images when requested without a size
+        :type full_size: tuple[int, int]
+        :param latency: The seconds to wait before answering each request
+        :type latency: float
+        :param bandwidth: The bytes per second to send the responses with (default: None = unlimited)
+        :type bandwidth: float
+        :param error_rate: The share of requests to fail with 503 Service Unavailable
+        :type error_rate: float
+        :param seed: The seed for the injected errors and random images
+        :type seed: int
+        """
+        super().__init__(address, MockPicsumHandler)
+        self.images = images
+        self.full_size = full_size
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.error_rate = error_rate
+        self._counter_lock = threading.Lock()
+        self._random = random.Random(seed)
+        self.reset_counters()
+
+    def reset_counters(self):
+        with self._counter_lock:
+            self.requests = 0
+            self.bytes_sent = 0
+            self.errors = 0
+
+    def count(self, sent: int, error: bool = False):
+        with self._counter_lock:
+            self.requests += 1
+            self.bytes_sent += sent
+            self.errors += int(error)
+
+    def should_fail(self) -> bool:
+        with self._counter_lock:
+            return self._random.random() < self.error_rate
+
+    def random_id(self) -> int:
+        with self._counter_lock:
+            return self._random.randrange(self.images)
+
+    def entry(self, picsum_id: int) -> dict:
+        width, height = self.full_size
+        host, port = self.server_address[:2]
+        return {
+            'id': str(picsum_id),
+            'author': f"Mock Author {picsum_id}",
+            'width': width,
+            'height': height,
+            'url': f"http://{host}:{port}/id/{picsum_id}",
+            'download_url': f"http://{host}:{port}/id/{picsum_id}/{width}/{height}",
+        }
+
+    def serve_in_background(self) -> threading.Thread:
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+
+@lru_cache(maxsize=64)
+def render_image(picsum_id: int, width: int, height: int, grayscale: bool) -> bytes:
+    """
+    Render a synthetic photo-like JPEG, the same for the same arguments.
+
+    :return: The encoded image
+    :rtype: bytes
+    """
+    rng = np.random.default_rng(picsum_id)
+    # Smooth gradients between random corner colors with some noise, which compresses like a photo
+    corners = rng.integers(0, 256, (2, 2, 3)).astype(np.float32)
+    y = np.linspace(0, 1, height, dtype=np.float32)[:, np.newaxis, np.newaxis]
+    x = np.linspace(0, 1, width, dtype=np.float32)[np.newaxis, :, np.newaxis]
+    pixels = (corners[0, 0] * (1 - x) * (1 - y) + corners[0, 1] * x * (1 - y)
+              + corners[1, 0] * (1 - x) * y + corners[1, 1] * x * y)
+    pixels += rng.normal(0, 12, (height, width, 1)).astype(np.float32)
+    img = PImage.fromarray(np.clip(pixels, 0, 255).astype(np.uint8))
+    if grayscale:
+        img = img.convert('L')
+    buf = io.BytesIO()
+    img.save(buf, format='JPEG', quality=85)
+    return buf.getvalue()
+
+
+class MockPicsumHandler(BaseHTTPRequestHandler):
+    # Keep-alive, like the real API, so connection pooling shows in the benchmarks
+    protocol_version = 'HTTP/1.1'
+    server: MockPicsum
+
+    def do_GET(self):
+        if self.server.latency > 0:
+            time.sleep(self.server.latency)
+        if self.server.should_fail():
+            self._send(503, b'Service Unavailable', 'text/plain', error=True)
+            return
+        url = urlsplit(self.path)
+        query = parse_qs(url.query, keep_blank_values=True)
+        if url.path == '/v2/list':
+            page = int(query.get('page', ['1'])[0])
+            limit = int(query.get('limit', ['30'])[0])
+            ids = range((page - 1) * limit, min(self.server.images, page * limit))
+            self._send_json([self.server.entry(picsum_id) for picsum_id in ids])
+            return
+        match = re.fullmatch(r'/id/(\d+)/info', url.path)
+        if match is not None:
+            picsum_id = int(match.group(1))
+            if picsum_id >= self.server.images:
+                self._send(404, b'Image does not exist', 'text/plain')
+                return
+            self._send_json(self.server.entry(picsum_id))
+            return
+        match = re.fullmatch(r'(?:/id/(\d+))?(?:/(\d+))?(?:/(\d+))?', url.path)
+        if match is None or url.path in ('', '/'):
+            self._send(404, b'Not Found', 'text/plain')
+            return
+        picsum_id, width, height = match.groups()
+        picsum_id = int(picsum_id) if picsum_id is not None else self.server.random_id()
+        if picsum_id >= self.server.images:
+            self._send(404, b'Image does not exist', 'text/plain')
+            return
+        if width is None:
+            width, height = self.server.full_size
+        else:
+            width = int(width)
+            # Like the real API, a single size results in a square image
+            height = int(height) if height is not None else width
+        body = render_image(picsum_id, width, height, 'grayscale' in query)
+        self._send(200, body, 'image/jpeg', {'picsum-id': str(picsum_id)})
+
+    def _send_json(self, data):
+        self._send(200, json.dumps(data).encode(), 'application/json')
+
+    def _send(self, status: int, body: bytes, content_type: str, headers: dict = None, error: bool = False):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        bandwidth = self.server.bandwidth
+        if bandwidth is None:
+            self.wfile.write(body)
+        else:
+            # Send in 10 ms slices of the bandwidth
+            chunk = max(1, int(bandwidth / 100))
+            for start in range(0, len(body), chunk):
+                self.wfile.write(body[start:start + chunk])
+                self.wfile.flush()
+                time.sleep(chunk / bandwidth)
+        self.server.count(len(body), error)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve an offline stand-in for the Picsum Lorem API')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--images', type=int, default=100)
+    parser.add_argument('--latency', help='Seconds to wait before each response', type=float, default=0.0)
+    parser.add_argument('--bandwidth', help='Bytes per second to send with', type=float, default=None)
+    parser.add_argument('--error-rate', help='Share of requests to fail with 503', type=float, default=0.0)
+    args = parser.parse_args()
+    server = MockPicsum((args.host, args.port), args.images, latency=args.latency, bandwidth=args.bandwidth,
+                        error_rate=args.error_rate)
+    print(f"Serving on http://{args.host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
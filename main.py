@@ -1,13 +1,21 @@
 import argparse
+import asyncio
 import sys
 from pathlib import Path
 
+import PIL.Image as PImage
+
 from themur.api import Themur
+from themur.batch import Batch, DEFAULT_WORKERS
 from themur.colorscheme import ColorScheme
-from themur.source import PicsumLorem, LocalSource
+from themur.display import get_monitors
+from themur.source import PicsumLorem, LocalSource, AsyncSource
 from themur.utils import get_monitor_resolution, print_color_table
-from themur.utils import print_colortest, get_cursor_pos
-from themur.w3mimg import W3mImg
+from themur.utils import print_colortest
+from themur.preview import get_preview
+from themur.rotation import Rotation
+from themur.terminal import Terminal
+from themur.tuner import Tuner
 
 WAL_DIR = Path.home() / '.cache/wal'
 CURRENT_IMAGE = WAL_DIR / 'current_wp.jpg'
@@ -27,7 +35,8 @@ def parse_args():
 
     parser.add_argument('--previous', '-p', help='Will load the image before the latest one', action='store_true',
                         default=False)
-    parser.add_argument('--full', help='Get the full sized image and crop later', action='store_true', default=False)
+    parser.add_argument('--full', help='Get the full sized image and crop it to the monitor while decoding',
+                        action='store_true', default=False)
     parser.add_argument('--redo', help='Do not get a new image but rather re-run with the current one',
                         action='store_true', default=False)
     parser.add_argument('--offset', help='Offset the brighter colors to distinguish between the two', action='store',
@@ -36,6 +45,18 @@ def parse_args():
                         default=False)
     parser.add_argument('--interpolate', help='Interpolate between the new and the reference colorscheme',
                         action='store', type=float, default=0.0)
+    parser.add_argument('--apply', help='Apply the color scheme of the given backend (or the best scoring one) to all '
+                                        'open terminals', action='store',
+                        choices=['best', 'colorthief', 'colorz', 'haishoku', 'schemer2', 'wal'])
+    parser.add_argument('--transition', help='Fade from the current color scheme over the given seconds when applying',
+                        action='store', type=float, default=0.0)
+    parser.add_argument('--rotate', help='Keep rotating to a new image and applying its color scheme (of the --apply '
+                                         'backend, default: best) every given seconds', action='store', type=float)
+    parser.add_argument('--batch', help='Extract the color schemes of the images (paths or Picsum IDs as JSON lines on '
+                                        'stdin) with the given number of workers and write them as JSON lines to '
+                                        'stdout', action='store', nargs='?', type=int, const=DEFAULT_WORKERS)
+    parser.add_argument('--tune', help='Interactively tune the offset, interpolation and backend',
+                        action='store_true', default=False)
 
     # LIST
 
@@ -58,65 +79,90 @@ def arg2dict(s: str) -> tuple[str, str | bool]:
 def main():
     args = parse_args()
     themur = Themur()
-    w, h = get_monitor_resolution()
+    if args.batch is not None:
+        exit(1 if Batch(themur, workers=args.batch).run(sys.stdin) > 0 else 0)
+    monitors = get_monitors(themur.cache_dir / 'monitors.json')
     opts = dict(args.opts)
     if isinstance(opts, set) or len(opts) == 0:
         opts = {}
-    if args.picsum:
-        source = PicsumLorem(themur.cache_dir)
-        if not args.full:
-            opts['width'] = w
-            opts['height'] = h
-    elif args.local:
-        path = Path(args.local)
-        if not path.exists():
-            raise FileNotFoundError(path)
-        source = LocalSource(path, themur.cache_dir)
-    else:
-        raise Exception()
-    if args.previous:
-        img, path, meta = source.get_last()
+    if args.redo:
+        path, _, meta, _ = themur._peek_history()
+        images = [(PImage.open(path), path, meta)]
     else:
-        img, path, meta = source.get_img(**opts)
-    s = f'\033[1m{path.stem} ({meta["width"]}x{meta["height"]}):'
-    if 'title' in meta.keys():
-        s += f' "{meta["title"]}"'
-    if 'id' in meta.keys():
-        s += f" ({meta['id']})"
-    if 'author' in meta.keys():
-        s += f" by {meta['author']}"
-    s += '\033[m'
-    print(s)
-
-    for backend, col_scheme in themur.get_color_schemes(path).items():
-        print(backend)
-        # print_color_table(col_scheme.to_256_colors())
-        if args.offset > 0:
-            # print("  ==> Offset")
-            col_scheme.offset(args.offset)
-            # print_color_table(col_scheme.to_256_colors())
-        if args.reorder:
-            # print("  ==> Reorder")
-            col_scheme.reorder(themur.reference_colorscheme)
-            # print_color_table(col_scheme.to_256_colors())
-        if args.interpolate > 0.0:
-            # print("  ==> Interpolate")
-            col_scheme.interpolate(themur.reference_colorscheme, args.interpolate)
-        print_color_table(col_scheme.to_256_colors())
-
-    PIXEL_PER_ROW = 12
-    PIXEL_PER_COLUMN = 6
-    h2 = (len(themur.backends) * 4) * PIXEL_PER_ROW
-    w2 = int(h2 / h * w)
-    w3m = W3mImg()
-    # print(os.get_terminal_size())
-    # print(getpos())
-    row, column = get_cursor_pos()
-    if row is not None and column is not None:
-        row -= 1
-        row *= PIXEL_PER_ROW
-        column = PIXEL_PER_COLUMN * (8 * 9 + 1)
-        w3m.draw(img, column, row - h2, w2, h2)
+        # One image per head, fetched concurrently
+        head_opts = [dict(opts) for _ in monitors]
+        if args.picsum:
+            source = PicsumLorem(themur.cache_dir)
+            for monitor, monitor_opts in zip(monitors, head_opts):
+                if args.full:
+                    monitor_opts['fit'] = (monitor.width, monitor.height)
+                else:
+                    monitor_opts['width'] = monitor.width
+                    monitor_opts['height'] = monitor.height
+        elif args.local:
+            path = Path(args.local)
+            if not path.exists():
+                raise FileNotFoundError(path)
+            source = LocalSource(path, themur.cache_dir)
+            for monitor, monitor_opts in zip(monitors, head_opts):
+                monitor_opts.setdefault('aspect', monitor.aspect)
+                monitor_opts.setdefault('fit', (monitor.width, monitor.height))
+        else:
+            raise Exception()
+        if args.rotate is not None:
+            Rotation(themur, source, head_opts[0], args.rotate, args.apply or 'best', args.offset, args.reorder,
+                     args.interpolate, args.transition, args.quiet).run()
+            exit()
+        if args.previous:
+            images = [source.get_last()]
+        else:
+            images = asyncio.run(AsyncSource(source).get_imgs(head_opts))
+            for (_, path, meta), monitor_opts in zip(images, head_opts):
+                themur._add_to_history(path, source, meta, monitor_opts)
+
+    terminal = Terminal(themur.cache_dir / 'terminals.json')
+    if terminal.capabilities is None:
+        # The preview depends on the capabilities, which are cached after the first probe
+        terminal.probe()
+    preview = get_preview(themur.config, terminal)
+    for (img, path, meta), monitor in zip(images, monitors):
+        s = f'\033[1m{monitor.name}: {path.stem} ({meta["width"]}x{meta["height"]}):'
+        if 'title' in meta.keys():
+            s += f' "{meta["title"]}"'
+        if 'id' in meta.keys():
+            s += f" ({meta['id']})"
+        if 'author' in meta.keys():
+            s += f" by {meta['author']}"
+        s += '\033[m'
+        print(s)
+
+        if args.tune:
+            tuner = Tuner(themur, path, args.offset, args.reorder, args.interpolate)
+            if tuner.run() is not None:
+                print(f"{tuner.backend}: --offset {tuner.offset} --interpolate {tuner.interpolate:.2f}"
+                      f"{' --reorder' if tuner.reorder else ''}")
+            exit()
+
+        # Shown as soon as each backend is done, the fastest first
+        for backend, col_scheme in themur.iter_color_schemes(path, args.offset, args.reorder, args.interpolate):
+            print(backend)
+            print_color_table(col_scheme.to_256_colors())
+
+        cursor_pos = terminal.probe() if preview is not None else None
+        if cursor_pos is not None:
+            columns, rows = preview.fit(img, len(themur.backends) * 4)
+            preview.draw(img, max(1, cursor_pos[0] - rows), 8 * 9 + 2, rows, columns)
+
+    if args.apply is not None:
+        _, path, _ = images[0]
+        backend = args.apply
+        if backend == 'best':
+            backend, col_scheme = themur.best_color_scheme(path, args.offset, args.reorder, args.interpolate)
+        else:
+            # Also works for a backend the latency budget left out
+            col_scheme = themur.post_processing(path, backend, args.offset, args.reorder, args.interpolate)
+        terminals = themur.apply_color_scheme(col_scheme, args.transition)
+        print(f"Applied {backend} to {len(terminals)} terminals")
     exit()
     img.show()
     print_color_table()
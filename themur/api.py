@@ -1,9 +1,16 @@
-import asyncio
+import hashlib
 import json
+import math
 import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import ExitStack
 from pathlib import Path
-from typing import Callable
+from typing import Callable, Iterator
 
+import PIL.Image as PImage
+import numpy as np
 import pywal
 from pywal.backends.colorthief import get as colorthief_get
 from pywal.backends.colorz import get as colorz_get
@@ -11,8 +18,19 @@ from pywal.backends.haishoku import get as haishoku_get
 from pywal.backends.schemer2 import get as schemer2_get
 from pywal.backends.wal import get as wal_get
 
+from themur.apply import apply
+from themur.backends import NATIVE_BACKENDS
 from themur.colorscheme import ColorScheme
+from themur.export import Exporter
+from themur.lock import FileLock, atomic_json_dump
+from themur.pipeline import Stage, file_key
+from themur.scheduler import BackendScheduler
+from themur.scoring import score
+from themur.shm import SharedImage
+from themur.store import SchemeStore
 from themur.source import Source, PicsumLorem, LocalSource
+from themur.source.cache import ImageCache, get_image_cache
+from themur.transition import transition
 
 
 class Themur:
@@ -20,10 +38,15 @@ class Themur:
     config: dict
     cache_dir: Path
     wal_cache_dir: Path
+    image_cache: ImageCache
     hist_file: Path
+    hist_lock: FileLock
     hist_size: int
     history: list[dict]
-    backends: dict[str, Callable[[str, bool], list[str]]]
+    backends: dict[str, Callable[[str | np.ndarray, bool], list[str]]]
+    native_backends: set[str]
+    _pool: ProcessPoolExecutor | None
+    _pool_lock: threading.Lock
     sources = {
         'LocalSource': LocalSource,
         'PicsumLorem': PicsumLorem
@@ -31,6 +54,11 @@ class Themur:
     reference_colorscheme: ColorScheme
     current_colorscheme: ColorScheme
     current_colorscheme_fp: Path
+    exporter: Exporter
+    scheduler: BackendScheduler
+    scheme_store: SchemeStore
+    extraction: Stage
+    post_processing: Stage
 
     def __init__(self,
                  config_dir: Path = Path(os.environ['XDG_CONFIG_HOME'], 'themur'),
@@ -50,7 +78,10 @@ class Themur:
         self.cache_dir = cache_dir
         self.wal_cache_dir = self.cache_dir / 'wal'
         self.wal_cache_dir.mkdir(parents=True, exist_ok=True)
+        self.image_cache = get_image_cache(self.cache_dir / 'cached', self.config.get('cache_budget'),
+                                           self.config.get('cache_policy'))
         self.hist_file = self.cache_dir / 'history.json'
+        self.hist_lock = FileLock(self.cache_dir / 'history.lock')
         self.hist_size = hist_size
         self.history = self._load_history()
         self.backends = {
@@ -60,12 +91,26 @@ class Themur:
             'schemer2': schemer2_get,
             'wal': wal_get,
         }
+        # Native backends work on the decoded pixels instead of the image file and are opt-in by the config
+        native_backends = {backend: NATIVE_BACKENDS[backend] for backend in self.config.get('native_backends', [])}
+        self.backends.update(native_backends)
+        self.native_backends = set(native_backends.keys())
+        self._pool = None
+        self._pool_lock = threading.Lock()
         self.reference_colorscheme = ColorScheme.load('resources/colorschemes/material_darker.json')
         self.current_colorscheme_fp = self.cache_dir / "current_colorscheme.json"
         if self.current_colorscheme_fp.exists():
             self.current_colorscheme = ColorScheme.load(self.current_colorscheme_fp)
         else:
             self.current_colorscheme = self.reference_colorscheme
+        self.exporter = Exporter(self.cache_dir / 'export', self.config.get('export'))
+        self.scheduler = BackendScheduler(self.cache_dir / 'backend_stats.json')
+        self.scheme_store = SchemeStore(self.cache_dir / 'store')
+        self.extraction = Stage(self._extract,
+                                key=lambda path, backend: (*file_key(path), backend),
+                                persist_store=self.scheme_store)
+        self.post_processing = Stage(self._post_process,
+                                     key=lambda path, backend, *params: (*file_key(path), backend, *params))
 
     def _load_history(self) -> list[dict]:
         if self.hist_file.exists():
@@ -74,19 +119,23 @@ class Themur:
             return []
 
     def _save_history(self):
-        json.dump(self.history, open(self.hist_file, 'w'))
+        atomic_json_dump(self.history, self.hist_file)
 
     def _add_to_history(self, path: Path, source: Source, meta: dict, options: dict):
-        if len(self.history) >= self.hist_size:
-            self.history.pop(0)
-        self.history.append({
-            'file': str(path),
-            'source': source.__class__.__name__,
-            'source_args': source.args,
-            'meta': meta,
-            'options': options,
-        })
-        self._save_history()
+        with self.hist_lock:
+            # Another run might have changed the history in the meantime
+            self.history = self._load_history()
+            if len(self.history) >= self.hist_size:
+                self.image_cache.unpin(Path(self.history.pop(0)['file']))
+            self.image_cache.pin(path)
+            self.history.append({
+                'file': str(path),
+                'source': source.__class__.__name__,
+                'source_args': source.args,
+                'meta': meta,
+                'options': options,
+            })
+            self._save_history()
 
     def _peek_history(self) -> tuple[Path, Source, dict, dict]:
         if len(self.history) == 0:
@@ -99,21 +148,236 @@ class Themur:
         return path, source, meta, options
 
     def _pop_from_history(self) -> tuple[Path, Source, dict, dict]:
-        if len(self.history) == 0:
-            raise Exception("No entries available in history")
-        path, source, meta, options = self._peek_history()
-        self.history.pop()
-        self._save_history()
+        with self.hist_lock:
+            self.history = self._load_history()
+            if len(self.history) == 0:
+                raise Exception("No entries available in history")
+            path, source, meta, options = self._peek_history()
+            self.history.pop()
+            self.image_cache.unpin(path)
+            self._save_history()
         return path, source, meta, options
 
-    def get_color_schemes(self, path: Path) -> dict[str, ColorScheme]:
-        async def get_cols():
-            async def get_col(path: str, backend: str) -> dict:
-                return pywal.colors.get(path, backend=backend, cache_dir=self.wal_cache_dir)
+    def get_color_schemes(self, path: Path, offset: int = 0, reorder: bool = False,
+                          interpolate: float = 0.0) -> dict[str, ColorScheme]:
+        """
+        Get the color schemes of all backends for an image, in the order of `iter_color_schemes`.
+
+        :param path: The image to extract the color schemes from
+        :type path: Path
+        :param offset: Offset the brighter colors to distinguish between the two (default: 0 = no offset)
+        :type offset: int
+        :param reorder: Whether to reorder the colors to match the reference color scheme
+        :type reorder: bool
+        :param interpolate: The ratio to interpolate towards the reference color scheme (default: 0.0)
+        :type interpolate: float
+        :return: The color scheme per backend
+        :rtype: dict[str, ColorScheme]
+        """
+        return dict(self.iter_color_schemes(path, offset, reorder, interpolate))
+
+    def iter_color_schemes(self, path: Path, offset: int = 0, reorder: bool = False,
+                           interpolate: float = 0.0) -> Iterator[tuple[str, ColorScheme]]:
+        """
+        Get the color schemes of all backends for an image, each as soon as it is ready.
+
+        The raw schemes and the post-processed ones are cached by their inputs, so changing only the post-processing
+        parameters does not re-run the backends.
+        If the config sets a 'latency_budget' in seconds, backends predicted to exceed it run on a downscaled image or
+        are left out (they are still extracted on demand by `extraction`). The cached schemes come first, ordered by
+        the predicted run time of their backends on the image, then the extracted ones in the order their backends
+        finish, so the fastest scheme can be shown while the slower backends are still running.
+
+        :param path: The image to extract the color schemes from
+        :type path: Path
+        :param offset: Offset the brighter colors to distinguish between the two (default: 0 = no offset)
+        :type offset: int
+        :param reorder: Whether to reorder the colors to match the reference color scheme
+        :type reorder: bool
+        :param interpolate: The ratio to interpolate towards the reference color scheme (default: 0.0)
+        :type interpolate: float
+        :return: The backends and their color schemes
+        :rtype: Iterator[tuple[str, ColorScheme]]
+        """
+        with PImage.open(path) as img:
+            pixels = img.width * img.height
+        cached = [backend for backend in self.backends.keys() if self.extraction.has(path, backend)]
+        missing = [backend for backend in self.backends.keys() if backend not in cached]
+        plan = self.scheduler.plan(missing, pixels, self.config.get('latency_budget'))
+
+        def latency(backend: str) -> float:
+            predicted = self.scheduler.predict(backend, pixels)
+            return predicted if predicted is not None else math.inf
+
+        for backend in sorted(cached, key=latency):
+            yield backend, self.post_processing(path, backend, offset, reorder, interpolate)
+        for backend in self._extract_in_parallel(path, pixels, plan):
+            yield backend, self.post_processing(path, backend, offset, reorder, interpolate)
+
+    def best_color_scheme(self, path: Path, offset: int = 0, reorder: bool = False,
+                          interpolate: float = 0.0) -> tuple[str, ColorScheme]:
+        """
+        Get the color scheme of the backend scoring best for an image.
+
+        All color schemes are scored at once on the contrast between background and foreground, the separation of the
+        colors 1 to 7 and how close their hues are to the reference color scheme, weighted by the 'score_weights' of the
+        config.
+
+        :param path: The image to extract the color schemes from
+        :type path: Path
+        :param offset: Offset the brighter colors to distinguish between the two (default: 0 = no offset)
+        :type offset: int
+        :param reorder: Whether to reorder the colors to match the reference color scheme
+        :type reorder: bool
+        :param interpolate: The ratio to interpolate towards the reference color scheme (default: 0.0)
+        :type interpolate: float
+        :return: The best backend and its color scheme
+        :rtype: tuple[str, ColorScheme]
+        """
+        col_schemes = self.get_color_schemes(path, offset, reorder, interpolate)
+        scores = score(ColorScheme.stack(list(col_schemes.values())), self.reference_colorscheme.to_array(),
+                       self.config.get('score_weights'))
+        backend = list(col_schemes.keys())[int(scores.argmax())]
+        return backend, col_schemes[backend]
+
+    def _extract_in_parallel(self, path: Path, pixels: int, plan: list[tuple[str, float]]) -> Iterator[str]:
+        # Yields every backend once its color scheme is stored
+        if len(plan) == 0:
+            return
+        with ExitStack() as stack:
+            # Hold the locks of the results (in a fixed order, so concurrent runs can't deadlock) and skip the ones
+            # another run extracted in the meantime
+            for lock_fp in sorted({self.extraction.lock_fp(path, backend) for backend, _ in plan}):
+                stack.enter_context(FileLock(lock_fp))
+            extracted = [backend for backend, _ in plan if self.extraction.has(path, backend)]
+            yield from extracted
+            plan = [(backend, scale) for backend, scale in plan if backend not in extracted]
+            if len(plan) == 0:
+                return
+            # Decode (and scale) the image only once per scale for all backends
+            shared = {}
+            scaled = {}
+            jobs = []
+            for backend, scale in plan:
+                if backend in self.native_backends:
+                    if scale not in shared:
+                        shared[scale] = stack.enter_context(SharedImage.create(_scaled(path, scale)))
+                    jobs.append((backend, str(path), self.wal_cache_dir, shared[scale].handle))
+                    continue
+                if scale not in scaled:
+                    scaled[scale] = path if scale >= 1.0 else self._scaled_copy(path, scale)
+                    if scale < 1.0:
+                        stack.callback(scaled[scale].unlink, missing_ok=True)
+                jobs.append((backend, str(scaled[scale]), self.wal_cache_dir, None))
+            if len(jobs) == 1:
+                results = [(plan[0], _run_backend(*jobs[0]))]
+            else:
+                pool = self._process_pool()
+                futures = {pool.submit(_run_backend, *job): planned for job, planned in zip(jobs, plan)}
+                results = ((futures[future], future.result()) for future in as_completed(futures))
+            try:
+                for (backend, scale), (data, seconds) in results:
+                    # Downscaled copies should not end up as the wallpaper
+                    data['wallpaper'] = str(path)
+                    self.extraction.store(ColorScheme.load(data), path, backend)
+                    self.scheduler.record(backend, round(pixels * min(1.0, scale) ** 2), seconds)
+                    yield backend
+            finally:
+                self.scheduler.save()
+
+    def _process_pool(self) -> ProcessPoolExecutor:
+        # Shared by all extractions, so concurrent ones (i.e. of a batch) neither start processes of their own nor
+        # run more backends at once than there are CPUs. Workers are only started once needed.
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(os.cpu_count())
+            return self._pool
+
+    def close(self):
+        """
+        Shut down the worker processes of the extractions, i.e. before dropping the instance in a long-running process.
+        """
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+
+    def _scaled_copy(self, path: Path, scale: float) -> Path:
+        name = hashlib.sha1(repr((*file_key(path), scale)).encode()).hexdigest()
+        fp = self.wal_cache_dir / 'scaled' / f"{name}.png"
+        fp.parent.mkdir(parents=True, exist_ok=True)
+        _scaled(path, scale).save(fp)
+        return fp
+
+    def apply_color_scheme(self, col_scheme: ColorScheme, duration: float = 0.0) -> list[Path]:
+        """
+        Make a color scheme the current one, apply it to all open terminals and export it.
+
+        :param col_scheme: The color scheme to apply
+        :type col_scheme: ColorScheme
+        :param duration: The duration in seconds to fade from the current color scheme (default: 0.0 = no fading)
+        :type duration: float
+        :return: The terminals the color scheme got applied to
+        :rtype: list[Path]
+        """
+        if duration > 0.0:
+            terminals = transition(self.current_colorscheme, col_scheme, duration)
+        else:
+            terminals = apply(col_scheme)
+        col_scheme.dump(self.current_colorscheme_fp)
+        self.current_colorscheme = col_scheme
+        self.exporter.export(col_scheme)
+        return terminals
+
+    def _extract(self, path: Path, backend: str) -> ColorScheme:
+        with PImage.open(path) as img:
+            pixels = img.width * img.height
+        start = time.perf_counter()
+        if backend in self.native_backends:
+            colors = self.backends[backend](np.asarray(PImage.open(path).convert('RGB')), False)
+            col_scheme = ColorScheme.load(pywal.colors.colors_to_dict(colors, str(path)))
+        else:
+            col_scheme = ColorScheme.load(_wal_get(str(path), backend, self.wal_cache_dir))
+        self.scheduler.record(backend, pixels, time.perf_counter() - start)
+        self.scheduler.save()
+        return col_scheme
+
+    def _post_process(self, path: Path, backend: str, offset: int, reorder: bool, interpolate: float) -> ColorScheme:
+        col_scheme = self.extraction(path, backend).copy()
+        if offset > 0:
+            col_scheme.offset(offset)
+        if reorder:
+            col_scheme.reorder(self.reference_colorscheme)
+        if interpolate > 0.0:
+            col_scheme.interpolate(self.reference_colorscheme, interpolate)
+        return col_scheme
+
+
+def _scaled(path: Path, scale: float) -> PImage.Image:
+    img = PImage.open(path)
+    if scale >= 1.0:
+        return img
+    size = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+    # Lets JPEGs be decoded at a fraction of their size
+    img.draft('RGB', size)
+    return img.convert('RGB').resize(size, PImage.Resampling.BOX)
+
+
+def _wal_get(path: str, backend: str, wal_cache_dir: Path) -> dict:
+    try:
+        return pywal.colors.get(path, backend=backend, cache_dir=wal_cache_dir)
+    except SystemExit as e:
+        # pywal exits if the tool of a backend is missing (i.e. schemer2 or imagemagick), which would end the caller
+        raise RuntimeError(f"Backend '{backend}' failed (exit status {e.code})") from None
 
-            cols = {}
-            for backend in self.backends.keys():
-                cols[backend] = ColorScheme.load(await get_col(str(path), backend))
-            return cols
 
-        return asyncio.run(get_cols())
+def _run_backend(backend: str, path: str, wal_cache_dir: Path,
+                 handle: tuple[str, tuple[int, int, int]] = None) -> tuple[dict, float]:
+    # Runs in a worker process: path based backends read the file, native ones attach to the shared pixels.
+    # Only the backend itself is timed, as that is what the scheduler predicts.
+    start = time.perf_counter()
+    if handle is None:
+        return _wal_get(path, backend, wal_cache_dir), time.perf_counter() - start
+    with SharedImage.attach(handle) as shared:
+        colors = NATIVE_BACKENDS[backend](shared.array(), False)
+    return pywal.colors.colors_to_dict(colors, path), time.perf_counter() - start
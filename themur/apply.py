@@ -0,0 +1,140 @@
+import os
+import select
+import time
+from pathlib import Path
+
+from themur.colorscheme import ColorScheme
+
+APPLY_TIMEOUT = 0.1
+PTS_DIR = Path('/dev/pts')
+
+
+def to_osc_sequences(scheme: ColorScheme) -> bytes:
+    """
+    Turn a color scheme into the escape sequences setting the palette (OSC 4), the foreground (OSC 10), the background
+    (OSC 11) and the cursor color (OSC 12) of a terminal.
+
+    :param scheme: The color scheme to apply
+    :type scheme: ColorScheme
+    :return: All escape sequences in one blob
+    :rtype: bytes
+    """
+    special = scheme.data['special']
+    return osc_sequences(list(scheme.data['colors'].values()), special['background'], special['foreground'],
+                         special['cursor'])
+
+
+def osc_sequences(colors: list[str], background: str, foreground: str, cursor: str) -> bytes:
+    seqs = [f"\x1b]4;{i};{color}\x1b\\" for i, color in enumerate(colors)]
+    seqs.append(f"\x1b]10;{foreground}\x1b\\")
+    seqs.append(f"\x1b]11;{background}\x1b\\")
+    seqs.append(f"\x1b]12;{cursor}\x1b\\")
+    return ''.join(seqs).encode()
+
+
+def get_terminals() -> list[Path]:
+    """
+    Get the pseudo terminals of the current user.
+
+    :return: The paths of the terminal devices
+    :rtype: list[Path]
+    """
+    uid = os.getuid()
+    terminals = []
+    for fp in PTS_DIR.iterdir():
+        if not fp.name.isdigit():
+            continue
+        try:
+            if fp.stat().st_uid == uid:
+                terminals.append(fp)
+        except OSError:
+            continue
+    return terminals
+
+
+class Terminals:
+    """
+    Writes to several terminals at once without blocking on any of them
+
+    The terminal devices are opened non-blocking and written to from a single select loop, so a stuck terminal only
+    costs the timeout and no thread per terminal is needed. Keep it open to write several times (i.e. animations).
+    """
+    paths: list[Path]
+    fds: dict[int, Path]
+
+    def __init__(self, paths: list[Path] = None):
+        """
+        :param paths: The terminal devices to write to (default: all of the current user)
+        :type paths: list[Path]
+        """
+        self.paths = get_terminals() if paths is None else paths
+        self.fds = {}
+
+    def __enter__(self) -> 'Terminals':
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def open(self):
+        for fp in self.paths:
+            try:
+                fd = os.open(fp, os.O_WRONLY | os.O_NOCTTY | os.O_NONBLOCK)
+            except OSError:
+                continue
+            self.fds[fd] = fp
+
+    def close(self):
+        for fd in self.fds.keys():
+            os.close(fd)
+        self.fds.clear()
+
+    def write(self, data: bytes, timeout: float = APPLY_TIMEOUT) -> list[Path]:
+        """
+        Write the same data to all terminals.
+
+        :param data: The data to write
+        :type data: bytes
+        :param timeout: The time in seconds after which terminals not done yet are given up on
+        :type timeout: float
+        :return: The terminals that received all of the data
+        :rtype: list[Path]
+        """
+        pending = {fd: memoryview(data) for fd in self.fds.keys()}
+        done = []
+        deadline = time.monotonic() + timeout
+        while len(pending) > 0:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            _, writable, _ = select.select([], list(pending.keys()), [], remaining)
+            for fd in writable:
+                try:
+                    pending[fd] = pending[fd][os.write(fd, pending[fd]):]
+                except BlockingIOError:
+                    continue
+                except OSError:
+                    del pending[fd]
+                    continue
+                if len(pending[fd]) == 0:
+                    del pending[fd]
+                    done.append(self.fds[fd])
+        return done
+
+
+def apply(scheme: ColorScheme, paths: list[Path] = None, timeout: float = APPLY_TIMEOUT) -> list[Path]:
+    """
+    Apply a color scheme to all open terminals of the current user.
+
+    :param scheme: The color scheme to apply
+    :type scheme: ColorScheme
+    :param paths: The terminal devices to apply it to (default: all of the current user)
+    :type paths: list[Path]
+    :param timeout: The time in seconds after which terminals not done yet are given up on
+    :type timeout: float
+    :return: The terminals the color scheme got applied to
+    :rtype: list[Path]
+    """
+    with Terminals(paths) as terminals:
+        return terminals.write(to_osc_sequences(scheme), timeout)
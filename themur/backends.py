@@ -0,0 +1,41 @@
+from typing import Callable
+
+import numpy as np
+from pywal.colors import generic_adjust
+
+from themur.utils import rgb2s
+
+HISTOGRAM_SAMPLES = 256 * 256
+HISTOGRAM_COLORS = 8
+
+
+def histogram_get(pixels: np.ndarray, light: bool = False) -> list[str]:
+    """
+    Generate a palette from the most frequent colors of an image, working directly on its pixels.
+
+    :param pixels: The RGB pixels of the image, of shape (height, width, 3)
+    :type pixels: np.ndarray
+    :param light: Whether to generate a light palette
+    :type light: bool
+    :return: The 16 colors
+    :rtype: list[str]
+    """
+    step = max(1, int(np.sqrt(pixels.shape[0] * pixels.shape[1] / HISTOGRAM_SAMPLES)))
+    sample = pixels[::step, ::step].reshape(-1, 3)
+    # 16 levels per channel
+    bins = sample.astype(np.uint16) >> 4
+    idx = (bins[:, 0] << 8) | (bins[:, 1] << 4) | bins[:, 2]
+    counts = np.bincount(idx, minlength=4096)
+    sums = np.stack([np.bincount(idx, weights=sample[:, c], minlength=4096) for c in range(3)], axis=-1)
+    top = np.argsort(counts)[::-1][:HISTOGRAM_COLORS]
+    top = top[counts[top] > 0]
+    colors = sums[top] / counts[top, np.newaxis]
+    colors = colors[np.argsort(colors @ np.array([0.299, 0.587, 0.114]))]
+    hexes = [rgb2s(*map(int, np.rint(color))) for color in colors]
+    hexes += [hexes[-1]] * (HISTOGRAM_COLORS - len(hexes))
+    return generic_adjust(hexes + hexes, light)
+
+
+NATIVE_BACKENDS: dict[str, Callable[[np.ndarray, bool], list[str]]] = {
+    'histogram': histogram_get,
+}
@@ -0,0 +1,134 @@
+import json
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+from pathlib import Path
+from typing import Iterable, TextIO
+
+from themur.api import Themur
+from themur.source import PicsumLorem
+
+DEFAULT_WORKERS = 4
+
+
+class Batch:
+    """
+    Headless extraction of the color schemes of many images, streamed as JSON lines
+
+    Every input line is either the path of an image as a JSON string or an object with a 'path' or a 'picsum_id'
+    (optionally with 'width', 'height', 'offset', 'reorder' and 'interpolate'). Every output line is an object with the
+    'index' of its input line, the 'input' itself and either the 'file' and the color 'schemes' per backend or an
+    'error'. Results are written as soon as they are ready, so they are not in the order of the input.
+
+    At most `max_pending` images are in flight: reading the input blocks until a result got written, so the memory
+    stays constant however many images are processed, and a slow consumer slows down the extraction.
+    The workers are threads sharing the process pool of the themur instance, so the backends of all images in flight
+    together never run in more processes than there are CPUs. Its scheduler and scheme store are safe to share.
+    """
+    themur: Themur
+    out: TextIO
+    workers: int
+    picsum: PicsumLorem | None
+    done: int
+    failed: int
+    _pending: threading.Semaphore
+    _out_lock: threading.Lock
+    _picsum_lock: threading.Lock
+    _closed: bool
+
+    def __init__(self, themur: Themur, out: TextIO = sys.stdout, workers: int = DEFAULT_WORKERS,
+                 max_pending: int = None):
+        """
+        :param themur: The themur instance to extract with
+        :type themur: Themur
+        :param out: Where to write the results to
+        :type out: TextIO
+        :param workers: The number of images to extract at once
+        :type workers: int
+        :param max_pending: The number of images read but not written yet (default: twice the workers)
+        :type max_pending: int
+        """
+        self.themur = themur
+        self.out = out
+        self.workers = workers
+        self.picsum = None
+        self.done = 0
+        self.failed = 0
+        self._pending = threading.Semaphore(max_pending if max_pending is not None else 2 * workers)
+        self._out_lock = threading.Lock()
+        self._picsum_lock = threading.Lock()
+        self._closed = False
+
+    def run(self, lines: Iterable[str]) -> int:
+        """
+        Process all input lines.
+
+        :param lines: The JSON lines to process (i.e. the standard input)
+        :type lines: Iterable[str]
+        :return: The number of images that failed
+        :rtype: int
+        """
+        with ThreadPoolExecutor(self.workers) as pool:
+            for index, line in enumerate(lines):
+                if line.strip() == '':
+                    continue
+                self._pending.acquire()
+                if self._closed:
+                    break
+                future = pool.submit(self._process, line)
+                future.add_done_callback(lambda f, i=index, l=line: self._write(i, l, f))
+        return self.failed
+
+    def _process(self, line: str) -> dict:
+        item = json.loads(line)
+        if isinstance(item, str):
+            item = {'path': item}
+        offset = int(item.get('offset', 0))
+        reorder = bool(item.get('reorder', False))
+        interpolate = float(item.get('interpolate', 0.0))
+        if 'picsum_id' in item:
+            _, path, _ = self._picsum().get_img(picsum_id=str(item['picsum_id']), width=item.get('width'),
+                                                height=item.get('height'))
+        elif 'path' in item:
+            path = Path(item['path'])
+            if not path.is_file():
+                raise FileNotFoundError(path)
+        else:
+            raise ValueError("Neither 'path' nor 'picsum_id' given")
+        schemes = self.themur.get_color_schemes(path, offset, reorder, interpolate)
+        # Keep the memory constant: the results are persisted already and not needed again
+        for backend in schemes.keys():
+            self.themur.extraction.forget(path, backend)
+            self.themur.post_processing.forget(path, backend, offset, reorder, interpolate)
+        return {'file': str(path), 'schemes': {backend: scheme.data for backend, scheme in schemes.items()}}
+
+    def _picsum(self) -> PicsumLorem:
+        with self._picsum_lock:
+            if self.picsum is None:
+                self.picsum = PicsumLorem(self.themur.cache_dir)
+            return self.picsum
+
+    def _write(self, index: int, line: str, future: Future):
+        try:
+            try:
+                result = future.result()
+            except BaseException as e:
+                # Every item gets a result, whatever went wrong with it
+                result = {'error': f"{e.__class__.__name__}: {e}"}
+            try:
+                item = json.loads(line)
+            except ValueError:
+                item = line.rstrip('\n')
+            with self._out_lock:
+                if 'error' in result:
+                    self.failed += 1
+                else:
+                    self.done += 1
+                if not self._closed:
+                    self.out.write(json.dumps({'index': index, 'input': item, **result}) + '\n')
+                    self.out.flush()
+        except BrokenPipeError:
+            # The consumer is gone, i.e. `| head`
+            self._closed = True
+        finally:
+            self._pending.release()
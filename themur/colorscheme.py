@@ -1,8 +1,18 @@
 import json
 from pathlib import Path
+from typing import TYPE_CHECKING
 
-from themur import print_color_table
-from themur.utils import rgb_to_256col_ansi, find_closest_color, s2rgb, rgb2s, rgb2lab
+import numpy as np
+
+from themur.lock import atomic_json_dump
+from themur.utils import print_color_table, rgb_to_256col_ansi, find_closest_color, s2rgb, rgb2s, rgb2lab
+
+if TYPE_CHECKING:
+    from themur.store import SchemeStore
+
+SPECIAL_COLORS = ('background', 'foreground', 'cursor')
+SCHEME_COLORS = 16 + len(SPECIAL_COLORS)
+_HEX_DIGITS = np.frombuffer(b'0123456789ABCDEF', dtype=np.uint8)
 
 
 class ColorScheme:
@@ -18,11 +28,99 @@ class ColorScheme:
         return scheme
 
     def dump(self, fp: Path):
-        json.dump(self.data, open(fp, 'w'))
+        atomic_json_dump(self.data, fp)
+
+    @staticmethod
+    def load_many(store: 'SchemeStore', keys: list[str] = None) -> list['ColorScheme | None']:
+        return store.load(keys)
+
+    @staticmethod
+    def dump_many(schemes: list['ColorScheme'], store: 'SchemeStore', keys: list[str]) -> list[int]:
+        return store.append(keys, schemes)
+
+    def copy(self) -> 'ColorScheme':
+        return ColorScheme.load(json.loads(json.dumps(self.data)))
 
     def to_rgb(self) -> list[tuple[int, int, int]]:
         return [s2rgb(hx) for hx in self.data['colors'].values()]
 
+    def to_array(self) -> np.ndarray:
+        """
+        Get the 16 colors followed by the background, foreground and cursor colors as an array.
+
+        :return: The colors as an array of shape (19, 3)
+        :rtype: np.ndarray
+        """
+        hexes = [*self.data['colors'].values(), *(self.data['special'][name] for name in SPECIAL_COLORS)]
+        return np.array([s2rgb(hx) for hx in hexes], dtype=np.uint8)
+
+    @staticmethod
+    def from_array(arr: np.ndarray, wallpaper: str = 'None') -> 'ColorScheme':
+        """
+        Create a color scheme from the colors in the order of `to_array`.
+
+        :param arr: The colors as an array of shape (19, 3)
+        :type arr: np.ndarray
+        :param wallpaper: The wallpaper the colors belong to
+        :type wallpaper: str
+        :return: The color scheme
+        :rtype: ColorScheme
+        """
+        hexes = [rgb2s(int(r), int(g), int(b)) for r, g, b in arr]
+        return ColorScheme.load({
+            'wallpaper': wallpaper,
+            'special': dict(zip(SPECIAL_COLORS, hexes[16:])),
+            'colors': {f"color{i}": hx for i, hx in enumerate(hexes[:16])},
+            'alpha': '100',
+        })
+
+    @staticmethod
+    def stack(schemes: list['ColorScheme']) -> np.ndarray:
+        """
+        Get the colors of many color schemes as one array, parsing all hex strings at once.
+
+        :param schemes: The color schemes
+        :type schemes: list[ColorScheme]
+        :return: The colors in the order of `to_array`, of shape (schemes, 19, 3)
+        :rtype: np.ndarray
+        """
+        hexes = ''.join(hx.lstrip('#') for scheme in schemes
+                        for hx in (*scheme.data['colors'].values(),
+                                   *(scheme.data['special'][name] for name in SPECIAL_COLORS)))
+        return np.frombuffer(bytes.fromhex(hexes), dtype=np.uint8).reshape(len(schemes), SCHEME_COLORS, 3)
+
+    @staticmethod
+    def from_arrays(arr: np.ndarray, wallpapers: list[str] = None, alphas: list[str] = None) -> list['ColorScheme']:
+        """
+        Create many color schemes at once, formatting all hex strings in one go.
+
+        :param arr: The colors in the order of `to_array`, of shape (schemes, 19, 3)
+        :type arr: np.ndarray
+        :param wallpapers: The wallpapers the colors belong to
+        :type wallpapers: list[str]
+        :param alphas: The alpha values of the color schemes
+        :type alphas: list[str]
+        :return: The color schemes
+        :rtype: list[ColorScheme]
+        """
+        arr = np.asarray(arr, dtype=np.uint8).reshape(-1, 3)
+        chars = np.empty((len(arr), 7), dtype=np.uint8)
+        chars[:, 0] = ord('#')
+        chars[:, 1::2] = _HEX_DIGITS[arr >> 4]
+        chars[:, 2::2] = _HEX_DIGITS[arr & 0xF]
+        hexes = chars.view('S7').ravel().astype(str).tolist()
+        schemes = []
+        color_names = [f"color{i}" for i in range(16)]
+        for i in range(len(hexes) // SCHEME_COLORS):
+            row = hexes[i * SCHEME_COLORS:(i + 1) * SCHEME_COLORS]
+            schemes.append(ColorScheme.load({
+                'wallpaper': wallpapers[i] if wallpapers is not None else 'None',
+                'special': dict(zip(SPECIAL_COLORS, row[16:])),
+                'colors': dict(zip(color_names, row[:16])),
+                'alpha': alphas[i] if alphas is not None else '100',
+            }))
+        return schemes
+
     def to_256_colors(self) -> list[str]:
         term_cols = []
         for rgb in self.to_rgb():
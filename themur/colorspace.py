@@ -0,0 +1,110 @@
+import numpy as np
+
+# sRGB (D65) to CIE XYZ, see https://en.wikipedia.org/wiki/SRGB
+RGB_TO_XYZ = np.array([
+    [0.4124564, 0.3575761, 0.1804375],
+    [0.2126729, 0.7151522, 0.0721750],
+    [0.0193339, 0.1191920, 0.9503041],
+])
+XYZ_TO_RGB = np.linalg.inv(RGB_TO_XYZ)
+D65_WHITE = np.array([0.95047, 1.0, 1.08883])
+LAB_EPSILON = 216 / 24389
+LAB_KAPPA = 24389 / 27
+
+
+def _srgb_to_linear(rgb: np.ndarray) -> np.ndarray:
+    c = np.asarray(rgb, dtype=np.float64) / 255
+    return np.where(c > 0.04045, ((c + 0.055) / 1.055) ** 2.4, c / 12.92)
+
+
+def rgb_to_lab(rgb: np.ndarray) -> np.ndarray:
+    """
+    Convert sRGB colors to CIE L*a*b*.
+
+    :param rgb: The colors with values between 0 and 255 in the last axis
+    :type rgb: np.ndarray
+    :return: The L*a*b* colors in the same shape
+    :rtype: np.ndarray
+    """
+    linear = _srgb_to_linear(rgb)
+    xyz = linear @ RGB_TO_XYZ.T / D65_WHITE
+    f = np.where(xyz > LAB_EPSILON, np.cbrt(xyz), (LAB_KAPPA * xyz + 16) / 116)
+    l = 116 * f[..., 1] - 16
+    a = 500 * (f[..., 0] - f[..., 1])
+    b = 200 * (f[..., 1] - f[..., 2])
+    return np.stack([l, a, b], axis=-1)
+
+
+def lab_to_rgb(lab: np.ndarray) -> np.ndarray:
+    """
+    Convert CIE L*a*b* colors to sRGB, clipping the ones outside of its gamut.
+
+    :param lab: The L*a*b* colors in the last axis
+    :type lab: np.ndarray
+    :return: The colors with values between 0 and 255 in the same shape
+    :rtype: np.ndarray
+    """
+    lab = np.asarray(lab, dtype=np.float64)
+    fy = (lab[..., 0] + 16) / 116
+    fx = fy + lab[..., 1] / 500
+    fz = fy - lab[..., 2] / 200
+    f = np.stack([fx, fy, fz], axis=-1)
+    xyz = np.where(f ** 3 > LAB_EPSILON, f ** 3, (116 * f - 16) / LAB_KAPPA) * D65_WHITE
+    linear = np.clip(xyz @ XYZ_TO_RGB.T, 0, 1)
+    c = np.where(linear > 0.0031308, 1.055 * linear ** (1 / 2.4) - 0.055, 12.92 * linear)
+    return np.rint(c * 255).astype(np.uint8)
+
+
+def ciede2000(lab1: np.ndarray, lab2: np.ndarray) -> np.ndarray:
+    """
+    Compute the CIEDE2000 color difference, see https://en.wikipedia.org/wiki/Color_difference#CIEDE2000.
+
+    :param lab1: The first L*a*b* colors in the last axis
+    :type lab1: np.ndarray
+    :param lab2: The second L*a*b* colors in the last axis, broadcastable against the first ones
+    :type lab2: np.ndarray
+    :return: The differences in the broadcast shape without the last axis
+    :rtype: np.ndarray
+    """
+    l1, a1, b1 = np.moveaxis(np.asarray(lab1, dtype=np.float64), -1, 0)
+    l2, a2, b2 = np.moveaxis(np.asarray(lab2, dtype=np.float64), -1, 0)
+    c_mean = (np.hypot(a1, b1) + np.hypot(a2, b2)) / 2
+    g = 0.5 * (1 - np.sqrt(c_mean ** 7 / (c_mean ** 7 + 25 ** 7)))
+    a1p = (1 + g) * a1
+    a2p = (1 + g) * a2
+    c1p = np.hypot(a1p, b1)
+    c2p = np.hypot(a2p, b2)
+    h1p = np.degrees(np.arctan2(b1, a1p)) % 360
+    h2p = np.degrees(np.arctan2(b2, a2p)) % 360
+    dlp = l2 - l1
+    dcp = c2p - c1p
+    dh = h2p - h1p
+    dh = np.where(dh > 180, dh - 360, np.where(dh < -180, dh + 360, dh))
+    dh = np.where(c1p * c2p == 0, 0, dh)
+    dhp = 2 * np.sqrt(c1p * c2p) * np.sin(np.radians(dh / 2))
+    lp_mean = (l1 + l2) / 2
+    cp_mean = (c1p + c2p) / 2
+    h_sum = h1p + h2p
+    hp_mean = np.where(np.abs(h1p - h2p) > 180, np.where(h_sum < 360, h_sum + 360, h_sum - 360), h_sum) / 2
+    hp_mean = np.where(c1p * c2p == 0, h_sum, hp_mean)
+    t = (1 - 0.17 * np.cos(np.radians(hp_mean - 30)) + 0.24 * np.cos(np.radians(2 * hp_mean))
+         + 0.32 * np.cos(np.radians(3 * hp_mean + 6)) - 0.20 * np.cos(np.radians(4 * hp_mean - 63)))
+    sl = 1 + 0.015 * (lp_mean - 50) ** 2 / np.sqrt(20 + (lp_mean - 50) ** 2)
+    sc = 1 + 0.045 * cp_mean
+    sh = 1 + 0.015 * cp_mean * t
+    rt = (-2 * np.sqrt(cp_mean ** 7 / (cp_mean ** 7 + 25 ** 7))
+          * np.sin(np.radians(60 * np.exp(-((hp_mean - 275) / 25) ** 2))))
+    return np.sqrt((dlp / sl) ** 2 + (dcp / sc) ** 2 + (dhp / sh) ** 2 + rt * (dcp / sc) * (dhp / sh))
+
+
+def relative_luminance(rgb: np.ndarray) -> np.ndarray:
+    """
+    Compute the relative luminance as defined by WCAG 2.
+
+    :param rgb: The colors with values between 0 and 255 in the last axis
+    :type rgb: np.ndarray
+    :return: The luminances between 0 and 1 in the shape without the last axis
+    :rtype: np.ndarray
+    """
+    linear = _srgb_to_linear(rgb)
+    return linear @ RGB_TO_XYZ[1]
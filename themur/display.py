@@ -0,0 +1,118 @@
+import json
+import os
+import re
+import shutil
+import subprocess
+from pathlib import Path
+from typing import NamedTuple
+
+from themur.lock import atomic_json_dump
+
+DRM_DIR = Path('/sys/class/drm')
+XRANDR_MONITOR_PATTERN = re.compile(r"(\d+)/\d+x(\d+)/\d+\+(\d+)\+(\d+)\s+(\S+)\s*$")
+
+
+class Monitor(NamedTuple):
+    name: str
+    x: int
+    y: int
+    width: int
+    height: int
+
+    @property
+    def aspect(self) -> float:
+        return self.width / self.height
+
+
+_monitors: dict[tuple[str, str], list[Monitor]] = {}
+
+
+def get_monitors(cache_fp: Path = None) -> list[Monitor]:
+    """
+    Get the geometry of every connected output.
+
+    The geometry is keyed on the display and on the state and modes of the kernel's DRM connectors, which are read
+    from sysfs without starting any process. Only if they changed, the display server is asked with
+    `xrandr --listmonitors`, or the geometry is derived from the connectors without one. If there are no connectors to
+    key on, nothing gets cached. Changes made with xrandr alone (i.e. another mode of the same outputs) leave the
+    connectors as they are, so they are not picked up until the cache file is removed.
+
+    :param cache_fp: The file to persist the geometry in between runs (default: memory only)
+    :type cache_fp: Path
+    :return: The monitors, ordered from left to right
+    :rtype: list[Monitor]
+    """
+    display = os.environ.get('WAYLAND_DISPLAY', os.environ.get('DISPLAY', ''))
+    fingerprint = _drm_fingerprint()
+    key = (display, fingerprint)
+    if key in _monitors:
+        return _monitors[key]
+    if len(fingerprint) == 0:
+        return _query_monitors(_list_xrandr_monitors())
+    cached = {}
+    if cache_fp is not None and cache_fp.is_file():
+        cached = json.load(open(cache_fp))
+    entry = cached.get(display)
+    if entry is not None and entry['fingerprint'] == fingerprint:
+        monitors = [Monitor(*monitor) for monitor in entry['monitors']]
+    else:
+        monitors = _query_monitors(_list_xrandr_monitors())
+        if cache_fp is not None:
+            cached[display] = {'fingerprint': fingerprint, 'monitors': [list(monitor) for monitor in monitors]}
+            atomic_json_dump(cached, cache_fp)
+    _monitors[key] = monitors
+    return monitors
+
+
+def _list_xrandr_monitors() -> str | None:
+    if shutil.which('xrandr') is None or 'DISPLAY' not in os.environ:
+        return None
+    try:
+        return subprocess.check_output(('xrandr', '--listmonitors'), stderr=subprocess.DEVNULL).decode()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _drm_fingerprint() -> str:
+    # Plugging, enabling or disabling an output changes the state of its connector, a new screen its modes
+    parts = []
+    for connector in sorted(DRM_DIR.glob('card*-*')):
+        try:
+            status = (connector / 'status').read_text().strip()
+            enabled = (connector / 'enabled').read_text().strip()
+            modes = ','.join((connector / 'modes').read_text().split())
+        except OSError:
+            continue
+        parts.append(f"{connector.name}={status},{enabled}:{modes}")
+    return ';'.join(parts)
+
+
+def _query_monitors(listing: str = None) -> list[Monitor]:
+    if listing is not None:
+        monitors = []
+        for line in listing.split('\n')[1:]:
+            match = XRANDR_MONITOR_PATTERN.search(line)
+            if match is not None:
+                width, height, x, y, name = match.groups()
+                monitors.append(Monitor(name, int(x), int(y), int(width), int(height)))
+        if len(monitors) > 0:
+            return sorted(monitors, key=lambda monitor: (monitor.x, monitor.y))
+    # Without a display server to ask, assume the preferred modes of the connected outputs side by side
+    monitors = []
+    x = 0
+    for connector in sorted(DRM_DIR.glob('card*-*')):
+        try:
+            if (connector / 'status').read_text().strip() != 'connected':
+                continue
+            mode = (connector / 'modes').read_text().split('\n', maxsplit=1)[0]
+        except OSError:
+            continue
+        if 'x' not in mode:
+            continue
+        width, height = mode.split('x', maxsplit=1)
+        width, height = int(width), int(re.match(r"\d+", height).group())
+        monitors.append(Monitor(connector.name.split('-', maxsplit=1)[1], x, 0, width, height))
+        x += width
+    if len(monitors) == 0:
+        raise Exception("Couldn't find the monitor resolution(s)")
+    return monitors
@@ -0,0 +1,130 @@
+import hashlib
+import json
+import subprocess
+from pathlib import Path
+from string import Formatter
+
+from themur.colorscheme import ColorScheme, SPECIAL_COLORS
+from themur.lock import atomic_write, atomic_json_dump
+from themur.utils import s2rgb
+
+TEMPLATE_DIR = Path('resources/templates')
+
+DEFAULT_RELOADS = {
+    'colors.Xresources': ['xrdb', '-merge', '{output}'],
+    'colors-kitty.conf': ['pkill', '-USR1', '-x', 'kitty'],
+}
+
+
+class Template:
+    """
+    Template compiled once into its literal parts and fields
+
+    Fields are the names of the colors (i.e. {color1}, {background}, {wallpaper}), optionally with a modifier:
+    {color1.strip} omits the '#' and {color1.rgb} gives the decimal components separated by commas.
+    Literal braces are written twice, i.e. {{ and }}.
+    """
+    fp: Path
+    parts: list[tuple[str, str | None]]
+
+    def __init__(self, fp: Path):
+        self.fp = fp
+        self.parts = [(literal, field) for literal, field, _, _ in Formatter().parse(fp.read_text())]
+
+    def render(self, variables: dict[str, str]) -> str:
+        out = []
+        for literal, field in self.parts:
+            out.append(literal)
+            if field is not None:
+                out.append(self._resolve(field, variables))
+        return ''.join(out)
+
+    @staticmethod
+    def _resolve(field: str, variables: dict[str, str]) -> str:
+        name, _, modifier = field.partition('.')
+        value = variables[name]
+        if modifier == 'strip':
+            return value.lstrip('#')
+        if modifier == 'rgb':
+            return ','.join(map(str, s2rgb(value)))
+        if modifier != '':
+            raise ValueError(f"Unknown modifier '{modifier}' in {{{field}}}")
+        return value
+
+
+class Exporter:
+    """
+    Renders color schemes into configuration files of other applications
+
+    Every output is only rewritten (atomically) and its application only signaled to reload if the rendered content
+    differs from the last export.
+    """
+    targets: list[dict]
+    hash_fp: Path
+    hashes: dict[str, str]
+    _templates: dict[Path, Template]
+
+    def __init__(self, export_dir: Path, targets: list[dict] = None):
+        """
+        :param export_dir: The directory for the outputs without an explicit location
+        :type export_dir: Path
+        :param targets: The templates to render, each a dictionary with the 'template' and optionally the 'output' file
+            and the 'reload' command, in which {output} is replaced (default: all templates of the resources)
+        :type targets: list[dict]
+        """
+        export_dir.mkdir(parents=True, exist_ok=True)
+        if targets is None:
+            targets = [{'template': str(fp)} for fp in sorted(TEMPLATE_DIR.iterdir())]
+        self.targets = []
+        for target in targets:
+            template = Path(target['template'])
+            self.targets.append({
+                'template': template,
+                'output': Path(target.get('output', export_dir / template.name)).expanduser(),
+                'reload': target.get('reload', DEFAULT_RELOADS.get(template.name)),
+            })
+        self.hash_fp = export_dir / 'hashes.json'
+        self.hashes = json.load(open(self.hash_fp)) if self.hash_fp.is_file() else {}
+        self._templates = {}
+
+    def export(self, scheme: ColorScheme) -> list[Path]:
+        """
+        Render all targets for a color scheme.
+
+        :param scheme: The color scheme to export
+        :type scheme: ColorScheme
+        :return: The outputs that changed
+        :rtype: list[Path]
+        """
+        variables = {
+            **scheme.data['colors'],
+            **{name: scheme.data['special'][name] for name in SPECIAL_COLORS},
+            'wallpaper': str(scheme.data.get('wallpaper', 'None')),
+            'alpha': str(scheme.data.get('alpha', '100')),
+        }
+        changed = []
+        for target in self.targets:
+            content = self._template(target['template']).render(variables).encode()
+            output = target['output']
+            digest = hashlib.sha256(content).hexdigest()
+            if self.hashes.get(str(output)) == digest and output.is_file():
+                continue
+            output.parent.mkdir(parents=True, exist_ok=True)
+            atomic_write(output, lambda f: f.write(content), binary=True)
+            self.hashes[str(output)] = digest
+            changed.append(output)
+            if target['reload'] is not None:
+                try:
+                    subprocess.run([arg.replace('{output}', str(output)) for arg in target['reload']],
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                except OSError:
+                    pass
+        if len(changed) > 0:
+            atomic_json_dump(self.hashes, self.hash_fp)
+        return changed
+
+    def _template(self, fp: Path) -> Template:
+        template = self._templates.get(fp)
+        if template is None:
+            template = self._templates[fp] = Template(fp)
+        return template
@@ -0,0 +1,109 @@
+import fcntl
+import json
+import os
+import stat
+import tempfile
+import threading
+from pathlib import Path
+from typing import Callable, IO, TypeVar
+
+T = TypeVar('T')
+
+# Read once at import, as reading it means setting it
+_UMASK = os.umask(0o022)
+os.umask(_UMASK)
+
+
+class FileLock:
+    """
+    Advisory lock on a file, shared between processes
+
+    Blocks until the lock is acquired. The lock is released when the context is left or the process dies.
+    The same instance can be used from several threads.
+    """
+    fp: Path
+    _fd: int | None
+    _thread_lock: threading.Lock
+
+    def __init__(self, fp: Path):
+        self.fp = fp
+        self._fd = None
+        self._thread_lock = threading.Lock()
+
+    def __enter__(self) -> 'FileLock':
+        self._thread_lock.acquire()
+        try:
+            self.fp.parent.mkdir(parents=True, exist_ok=True)
+            self._fd = os.open(self.fp, os.O_RDWR | os.O_CREAT, 0o644)
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+        except BaseException:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+            self._thread_lock.release()
+            raise
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        fcntl.flock(self._fd, fcntl.LOCK_UN)
+        os.close(self._fd)
+        self._fd = None
+        self._thread_lock.release()
+
+
+def single_flight(lock_fp: Path, load: Callable[[], T | None], compute: Callable[[], T]) -> T:
+    """
+    Compute a result at most once, even if several processes ask for it at the same time.
+
+    Whoever holds the lock computes the result, everybody else waits for it and then loads the finished result.
+
+    :param lock_fp: The lock file identifying the result
+    :type lock_fp: Path
+    :param load: Loads the result if it is available and returns None otherwise
+    :type load: Callable[[], T | None]
+    :param compute: Computes and stores the result
+    :type compute: Callable[[], T]
+    :return: The result
+    :rtype: T
+    """
+    result = load()
+    if result is not None:
+        return result
+    with FileLock(lock_fp):
+        result = load()
+        if result is not None:
+            return result
+        return compute()
+
+
+def atomic_write(fp: Path, write: Callable[[IO], None], binary: bool = False):
+    """
+    Write a file so that readers either see the old or the new content but never a partially written one.
+
+    The file keeps its permissions, or gets the default ones of the umask if it is new.
+
+    :param fp: The file to write
+    :type fp: Path
+    :param write: Writes the content into the given file object
+    :type write: Callable[[IO], None]
+    :param binary: Whether the file object should be opened in binary mode
+    :type binary: bool
+    """
+    fd, tmp = tempfile.mkstemp(prefix=f".{fp.name}.", suffix='.tmp', dir=fp.parent)
+    try:
+        with os.fdopen(fd, 'wb' if binary else 'w') as f:
+            write(f)
+        # The temporary file is only readable by its owner
+        try:
+            mode = stat.S_IMODE(os.stat(fp).st_mode)
+        except FileNotFoundError:
+            mode = 0o666 & ~_UMASK
+        os.chmod(tmp, mode)
+        os.replace(tmp, fp)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def atomic_json_dump(data, fp: Path):
+    atomic_write(fp, lambda f: json.dump(data, f))
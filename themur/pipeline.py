@@ -0,0 +1,147 @@
+import hashlib
+import json
+from pathlib import Path
+from typing import Callable, Hashable, Any
+
+from themur.lock import single_flight, atomic_json_dump
+
+
+def file_key(path: Path) -> tuple[str, int, int]:
+    """
+    Identify a file by its location and its last modification without reading its contents.
+
+    :param path: The file to identify
+    :type path: Path
+    :return: The resolved path, its modification time and its size
+    :rtype: tuple[str, int, int]
+    """
+    path = Path(path).resolve()
+    stat = path.stat()
+    return str(path), stat.st_mtime_ns, stat.st_size
+
+
+class Stage:
+    """
+    A step of the theming pipeline whose results are memoized by the key of its inputs.
+
+    Results are kept in memory and, if a directory is given, persisted as JSON so later runs can skip the stage.
+    Persisted results are computed only once across processes: concurrent runs wait for the one computing it.
+    Alternatively, results are persisted in a store with `get`, `put`, `has` and `lock_fp` by the representation of
+    their key (i.e. a `SchemeStore`), where they are computed only once as well.
+    """
+    func: Callable[..., Any]
+    key: Callable[..., Hashable]
+    persist_dir: Path | None
+    persist_store: Any
+    encode: Callable[[Any], Any]
+    decode: Callable[[Any], Any]
+    _results: dict[Hashable, Any]
+
+    def __init__(self, func: Callable[..., Any], key: Callable[..., Hashable] = None, persist_dir: Path = None,
+                 encode: Callable[[Any], Any] = None, decode: Callable[[Any], Any] = None, persist_store=None):
+        """
+        :param func: The computation of the stage
+        :type func: Callable[..., Any]
+        :param key: Derives the cache key from the arguments (default: the arguments themselves)
+        :type key: Callable[..., Hashable]
+        :param persist_dir: The directory to persist the results to (default: memory only)
+        :type persist_dir: Path
+        :param encode: Converts a result to something JSON serializable
+        :type encode: Callable[[Any], Any]
+        :param decode: Converts the JSON data back to a result
+        :type decode: Callable[[Any], Any]
+        :param persist_store: The store to persist the results to instead of a directory
+        """
+        self.func = func
+        self.key = key if key is not None else lambda *args: args
+        self.persist_dir = persist_dir
+        if self.persist_dir is not None:
+            self.persist_dir.mkdir(parents=True, exist_ok=True)
+        self.encode = encode if encode is not None else lambda result: result
+        self.decode = decode if decode is not None else lambda data: data
+        self.persist_store = persist_store
+        self._results = {}
+
+    def __call__(self, *args):
+        key = self.key(*args)
+        if key in self._results:
+            return self._results[key]
+        fp = self._persist_fp(key)
+        if self.persist_store is not None:
+            def compute():
+                computed = self.func(*args)
+                self.persist_store.put(repr(key), computed)
+                return computed
+
+            result = single_flight(self.lock_fp(*args), lambda: self.persist_store.get(repr(key)), compute)
+        elif fp is None:
+            result = self.func(*args)
+        else:
+            def load():
+                if fp.is_file():
+                    return self.decode(json.load(open(fp)))
+                return None
+
+            def compute():
+                computed = self.func(*args)
+                atomic_json_dump(self.encode(computed), fp)
+                return computed
+
+            result = single_flight(self.lock_fp(*args), load, compute)
+        self._results[key] = result
+        return result
+
+    def has(self, *args) -> bool:
+        key = self.key(*args)
+        if key in self._results:
+            return True
+        if self.persist_store is not None:
+            return self.persist_store.has(repr(key))
+        fp = self._persist_fp(key)
+        return fp is not None and fp.is_file()
+
+    def store(self, result, *args):
+        """
+        Store a result computed outside of the stage (i.e. in another process).
+
+        :param result: The result of the stage for the arguments
+        :param args: The arguments the result belongs to
+        """
+        key = self.key(*args)
+        fp = self._persist_fp(key)
+        if self.persist_store is not None:
+            self.persist_store.put(repr(key), result)
+        elif fp is not None:
+            atomic_json_dump(self.encode(result), fp)
+        self._results[key] = result
+
+    def lock_fp(self, *args) -> Path | None:
+        """
+        Get the lock file held while the result is computed, i.e. to compute it elsewhere without duplicating the work.
+
+        :param args: The arguments the result belongs to
+        :return: The lock file or None if the results are not persisted
+        :rtype: Path | None
+        """
+        key = self.key(*args)
+        if self.persist_store is not None:
+            return self.persist_store.lock_fp(repr(key))
+        fp = self._persist_fp(key)
+        return fp.with_suffix('.lock') if fp is not None else None
+
+    def _persist_fp(self, key: Hashable) -> Path | None:
+        if self.persist_dir is None:
+            return None
+        digest = hashlib.sha1(repr(key).encode()).hexdigest()
+        return self.persist_dir / f"{digest}.json"
+
+    def forget(self, *args):
+        """
+        Drop a result from memory, while keeping it persisted.
+
+        :param args: The arguments the result belongs to
+        """
+        self._results.pop(self.key(*args), None)
+
+    def invalidate(self):
+        self._results.clear()
@@ -0,0 +1,201 @@
+import base64
+import os
+import re
+import shutil
+import sys
+from abc import ABC, abstractmethod
+from pathlib import Path
+
+from PIL.Image import Image
+
+from themur.terminal import Terminal, get_cell_size
+from themur.w3mimg import W3mImg
+
+# Only used if the terminal does not report its size in pixels
+DEFAULT_CELL_SIZE = (6, 12)
+
+KITTY_CHUNK_SIZE = 4096
+SIXEL_MAX_COLORS = 255
+SIXEL_TABLE = bytes(range(63, 127)) + bytes(192)
+SIXEL_RUN_PATTERN = re.compile(rb"(.)\1{3,}")
+
+
+class Preview(ABC):
+    """
+    Draws an image into the terminal, placed and sized in terminal cells
+    """
+    cell_size: tuple[int, int]
+
+    def __init__(self, cell_size: tuple[int, int] = None):
+        if cell_size is None:
+            cell_size = get_cell_size()
+        self.cell_size = cell_size if cell_size is not None else DEFAULT_CELL_SIZE
+
+    def fit(self, img: Image, rows: int) -> tuple[int, int]:
+        """
+        Get the size in cells an image needs to span the given rows without being distorted.
+
+        :param img: The image to fit
+        :type img: Image
+        :param rows: The number of rows to span
+        :type rows: int
+        :return: The columns and rows
+        :rtype: tuple[int, int]
+        """
+        cell_w, cell_h = self.cell_size
+        return max(1, round(rows * cell_h * img.width / img.height / cell_w)), rows
+
+    @abstractmethod
+    def draw(self, img: Image, row: int, column: int, rows: int, columns: int):
+        """
+        Draw an image without moving the cursor.
+
+        :param img: The image to draw
+        :type img: Image
+        :param row: The row of the top left corner (starting at 1)
+        :type row: int
+        :param column: The column of the top left corner (starting at 1)
+        :type column: int
+        :param rows: The number of rows to span
+        :type rows: int
+        :param columns: The number of columns to span
+        :type columns: int
+        """
+        pass
+
+    def _scale(self, img: Image, rows: int, columns: int) -> Image:
+        cell_w, cell_h = self.cell_size
+        return img.convert('RGB').resize((columns * cell_w, rows * cell_h))
+
+    @staticmethod
+    def _write(data: bytes):
+        # All in one go, to not interleave with other output
+        sys.stdout.flush()
+        fd = sys.stdout.fileno()
+        view = memoryview(data)
+        while len(view) > 0:
+            view = view[os.write(fd, view):]
+
+
+class KittyPreview(Preview):
+    """
+    Preview using the kitty graphics protocol (see https://sw.kovidgoyal.net/kitty/graphics-protocol/)
+    """
+
+    def draw(self, img: Image, row: int, column: int, rows: int, columns: int):
+        img = self._scale(img, rows, columns)
+        payload = base64.standard_b64encode(img.tobytes())
+        chunks = [payload[i:i + KITTY_CHUNK_SIZE] for i in range(0, len(payload), KITTY_CHUNK_SIZE)]
+        data = bytearray(f"\x1b7\x1b[{row};{column}H".encode())
+        for i, chunk in enumerate(chunks):
+            more = int(i < len(chunks) - 1)
+            if i == 0:
+                control = f"a=T,f=24,s={img.width},v={img.height},c={columns},r={rows},C=1,q=2,m={more}"
+            else:
+                control = f"m={more}"
+            data += b"\x1b_G" + control.encode() + b";" + chunk + b"\x1b\\"
+        data += b"\x1b8"
+        self._write(bytes(data))
+
+
+class SixelPreview(Preview):
+    """
+    Preview using sixel graphics
+    """
+
+    def draw(self, img: Image, row: int, column: int, rows: int, columns: int):
+        img = self._scale(img, rows, columns)
+        data = f"\x1b7\x1b[{row};{column}H".encode() + self.encode(img) + b"\x1b8"
+        self._write(data)
+
+    @staticmethod
+    def encode(img: Image) -> bytes:
+        """
+        Encode an image as sixel data.
+
+        :param img: The image to encode
+        :type img: Image
+        :return: The sixel escape sequence
+        :rtype: bytes
+        """
+        img = img.quantize(SIXEL_MAX_COLORS)
+        w, h = img.size
+        pixels = img.tobytes()
+        palette = img.getpalette()
+        out = bytearray(f'\x1bPq"1;1;{w};{h}'.encode())
+        for i in range(max(pixels) + 1):
+            r, g, b = palette[i * 3:i * 3 + 3]
+            out += f"#{i};2;{r * 100 // 255};{g * 100 // 255};{b * 100 // 255}".encode()
+        for top in range(0, h, 6):
+            # The bits of every color present in this band of six rows, one byte per column
+            bands: dict[int, bytearray] = {}
+            for dy in range(min(6, h - top)):
+                bit = 1 << dy
+                offset = (top + dy) * w
+                for x, color in enumerate(pixels[offset:offset + w]):
+                    band = bands.get(color)
+                    if band is None:
+                        band = bands[color] = bytearray(w)
+                    band[x] |= bit
+            for color, band in bands.items():
+                sixels = SIXEL_RUN_PATTERN.sub(lambda m: b"!%d%c" % (len(m.group(0)), m.group(1)[0]),
+                                               band.translate(SIXEL_TABLE))
+                out += f"#{color}".encode() + sixels + b"$"
+            out += b"-"
+        out += b"\x1b\\"
+        return bytes(out)
+
+
+class W3mImgPreview(Preview):
+    """
+    Preview using the w3mimgdisplay helper
+    """
+    w3mimg: W3mImg
+
+    def __init__(self, cell_size: tuple[int, int] = None, path: Path = None):
+        super().__init__(cell_size)
+        self.w3mimg = W3mImg() if path is None else W3mImg(path)
+
+    def draw(self, img: Image, row: int, column: int, rows: int, columns: int):
+        cell_w, cell_h = self.cell_size
+        self.w3mimg.draw(img, (column - 1) * cell_w, (row - 1) * cell_h, columns * cell_w, rows * cell_h)
+
+
+PREVIEWS = {
+    'kitty': KittyPreview,
+    'sixel': SixelPreview,
+    'w3m': W3mImgPreview,
+}
+
+
+def get_preview(config: dict = None, terminal: Terminal = None) -> Preview | None:
+    """
+    Get the preview supported by the current terminal.
+
+    :param config: The configuration, whose 'preview' entry can force one of 'kitty', 'sixel' or 'w3m'
+    :type config: dict
+    :param terminal: The probed terminal, whose capabilities take precedence over guessing from the environment
+    :type terminal: Terminal
+    :return: The preview or None if the terminal does not support any
+    :rtype: Preview | None
+    """
+    config = {} if config is None else config
+    capabilities = terminal.capabilities if terminal is not None and terminal.capabilities is not None else {}
+    cell_size = terminal.cell_size if terminal is not None else None
+    name = config.get('preview')
+    if name is None:
+        term = os.environ.get('TERM', '')
+        term_program = os.environ.get('TERM_PROGRAM', '')
+        if capabilities.get('kitty_graphics') or 'KITTY_WINDOW_ID' in os.environ or term == 'xterm-kitty' \
+                or term_program in ('WezTerm', 'ghostty'):
+            name = 'kitty'
+        elif capabilities.get('sixel') or any(t in term for t in ('sixel', 'foot', 'mlterm', 'contour')) \
+                or term_program in ('mintty', 'iTerm.app'):
+            name = 'sixel'
+        elif shutil.which(config.get('w3mimg', str(W3mImg().path))) is not None:
+            name = 'w3m'
+        else:
+            return None
+    if name == 'w3m' and 'w3mimg' in config:
+        return W3mImgPreview(cell_size, Path(config['w3mimg']))
+    return PREVIEWS[name](cell_size)
@@ -0,0 +1,201 @@
+import json
+import multiprocessing.util
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+from themur.api import Themur
+from themur.colorscheme import ColorScheme
+from themur.source import Source
+
+PREWARM_NICENESS = 19
+DEFAULT_LEAD = 30.0
+MIN_LEAD = 1.0
+LEAD_MARGIN = 1.5
+LEAD_WINDOW = 10
+
+
+class Rotation:
+    """
+    Rotates the color scheme on a fixed interval
+
+    The next image is fetched and its color schemes extracted in a low priority worker process ahead of each deadline,
+    so at the deadline only the precomputed color scheme has to be applied. Every rotation is logged with its timings,
+    and the lead time is adapted to the slowest of the latest preparations, also across restarts. A failed preparation
+    (i.e. the source being offline) is logged as a missed rotation and the next one is prepared as usual.
+    """
+    themur: Themur
+    source: Source
+    options: dict
+    interval: float
+    backend: str
+    post_processing: tuple[int, bool, float]
+    transition: float
+    log_fp: Path
+    lead: float
+    preparations: deque[float]
+    quiet: bool
+
+    def __init__(self, themur: Themur, source: Source, options: dict, interval: float, backend: str = 'best',
+                 offset: int = 0, reorder: bool = False, interpolate: float = 0.0, transition: float = 0.0,
+                 quiet: bool = False):
+        """
+        :param themur: The themur instance to extract with and apply through
+        :type themur: Themur
+        :param source: The source of the images
+        :type source: Source
+        :param options: The options to get the images with
+        :type options: dict
+        :param interval: The seconds between two rotations
+        :type interval: float
+        :param backend: The backend to apply the color scheme of (default: 'best' = the best scoring one)
+        :type backend: str
+        :param offset: Offset the brighter colors to distinguish between the two (default: 0 = no offset)
+        :type offset: int
+        :param reorder: Whether to reorder the colors to match the reference color scheme
+        :type reorder: bool
+        :param interpolate: The ratio to interpolate towards the reference color scheme (default: 0.0)
+        :type interpolate: float
+        :param transition: The duration in seconds to fade between the color schemes (default: 0.0 = no fading)
+        :type transition: float
+        :param quiet: Whether to not print the rotations
+        :type quiet: bool
+        """
+        self.themur = themur
+        self.source = source
+        self.options = options
+        self.interval = interval
+        self.backend = backend
+        self.post_processing = (offset, reorder, interpolate)
+        self.transition = transition
+        self.quiet = quiet
+        self.log_fp = self.themur.cache_dir / 'rotation.jsonl'
+        # Only the log of earlier runs is read, the durations of this one are kept in memory
+        self.preparations = deque((entry['prepare'] for entry in self._load_log() if 'error' not in entry),
+                                  maxlen=LEAD_WINDOW)
+        self.lead = self._adapted_lead()
+
+    def run(self, rotations: int = None):
+        """
+        Rotate until interrupted.
+
+        :param rotations: The number of rotations to stop after (default: None = never)
+        :type rotations: int
+        """
+        # The first rotation is due as soon as it can be prepared
+        deadline = time.time() + self.lead
+        done = 0
+        pool = _prewarm_pool(self.themur.config_dir, self.themur.cache_dir)
+        try:
+            while rotations is None or done < rotations:
+                time.sleep(max(0.0, deadline - self.lead - time.time()))
+                started = time.time()
+                try:
+                    path, meta, backend, data = pool.submit(
+                        _prepare, self.source.__class__.__name__, self.source.args, dict(self.options), self.backend, *self.post_processing).result()
+                except Exception as e:
+                    if isinstance(e, BrokenProcessPool):
+                        # The worker died (i.e. killed for running out of memory), the next rotation gets a new one
+                        pool.shutdown()
+                        pool = _prewarm_pool(self.themur.config_dir, self.themur.cache_dir)
+                    entry = {
+                        'deadline': deadline,
+                        'lead': self.lead,
+                        'prepare': time.time() - started,
+                        'late': 0.0,
+                        'missed': True,
+                        'file': None,
+                        'backend': None,
+                        'error': f"{e.__class__.__name__}: {e}",
+                    }
+                    self._log(entry)
+                    if not self.quiet:
+                        print(f"Missed the rotation: {entry['error']}", file=sys.stderr)
+                    done += 1
+                    deadline = self._next_deadline(deadline)
+                    continue
+                ready = time.time()
+                time.sleep(max(0.0, deadline - ready))
+                applied = time.time()
+                self.themur._add_to_history(Path(path), self.source, meta, self.options)
+                terminals = self.themur.apply_color_scheme(ColorScheme.load(data), self.transition)
+                entry = {
+                    'deadline': deadline,
+                    'lead': self.lead,
+                    'prepare': ready - started,
+                    'late': max(0.0, applied - deadline),
+                    'missed': ready > deadline,
+                    'file': path,
+                    'backend': backend,
+                }
+                self._log(entry)
+                if not self.quiet:
+                    status = f"missed by {entry['late']:.2f}s" if entry['missed'] else 'on time'
+                    print(f"Applied {backend} of {Path(path).stem} to {len(terminals)} terminals {status} "
+                          f"(prepared in {entry['prepare']:.2f}s)", file=sys.stderr)
+                self.preparations.append(entry['prepare'])
+                self.lead = self._adapted_lead()
+                done += 1
+                deadline = self._next_deadline(deadline)
+        finally:
+            pool.shutdown()
+
+    def _next_deadline(self, deadline: float) -> float:
+        deadline += self.interval
+        # Skip the deadlines that passed already instead of rotating several times in a row
+        while deadline < time.time():
+            deadline += self.interval
+        return deadline
+
+    def _load_log(self) -> list[dict]:
+        if not self.log_fp.is_file():
+            return []
+        with open(self.log_fp) as f:
+            return [json.loads(line) for line in f if line.strip() != '']
+
+    def _log(self, entry: dict):
+        with open(self.log_fp, 'a') as f:
+            f.write(json.dumps(entry) + '\n')
+
+    def _adapted_lead(self) -> float:
+        if len(self.preparations) == 0:
+            return min(DEFAULT_LEAD, self.interval)
+        # Start early enough for the slowest recent preparation, but never before the previous rotation
+        return min(self.interval, max(MIN_LEAD, LEAD_MARGIN * max(self.preparations)))
+
+
+# The instance of the worker process, kept for all the rotations it prepares
+_worker_themur: Themur | None = None
+
+
+def _prewarm_pool(config_dir: Path, cache_dir: Path) -> ProcessPoolExecutor:
+    return ProcessPoolExecutor(1, initializer=_init_worker, initargs=(config_dir, cache_dir))
+
+
+def _init_worker(config_dir: Path, cache_dir: Path):
+    global _worker_themur
+    os.nice(PREWARM_NICENESS)
+    _worker_themur = Themur(config_dir, cache_dir)
+    # Worker processes skip the regular exit handlers, which would shut down the extraction processes
+    multiprocessing.util.Finalize(_worker_themur, _worker_themur.close, exitpriority=0)
+
+
+def _prepare(source_name: str, source_args: dict, options: dict, backend: str, offset: int, reorder: bool,
+             interpolate: float) -> tuple[str, dict, str, dict]:
+    # Runs in the low priority worker process, whose extraction workers inherit its priority
+    themur = _worker_themur
+    source = Themur.sources[source_name](**source_args)
+    _, path, meta = source.get_img(**options)
+    if backend == 'best':
+        backend, col_scheme = themur.best_color_scheme(path, offset, reorder, interpolate)
+    else:
+        col_scheme = themur.post_processing(path, backend, offset, reorder, interpolate)
+    # Keep the memory of the long-lived worker constant: the results are persisted already
+    for other in themur.backends.keys():
+        themur.extraction.forget(path, other)
+        themur.post_processing.forget(path, other, offset, reorder, interpolate)
+    return str(path), meta, backend, col_scheme.data
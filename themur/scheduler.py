@@ -0,0 +1,123 @@
+import json
+import math
+import statistics
+import threading
+from pathlib import Path
+
+from themur.lock import FileLock, atomic_json_dump
+
+STATS_WINDOW = 32
+MIN_SCALE = 0.125
+
+
+class BackendScheduler:
+    """
+    Plans the backend runs for an image from how long they took on previous images
+
+    The run time of every backend is modeled as a fixed overhead plus a cost per pixel, fitted on its latest runs.
+    Given a latency budget, backends predicted to exceed it get a downscaled image, or are skipped entirely if even
+    the smallest one would not meet it.
+    Runs recorded by concurrent processes are merged when saving, instead of the last one overwriting the others.
+    """
+    fp: Path
+    samples: dict[str, list[list[float]]]
+    _recorded: dict[str, list[list[float]]]
+    _lock: threading.Lock
+    _file_lock: FileLock
+
+    def __init__(self, fp: Path):
+        """
+        :param fp: The file to keep the recorded run times in
+        :type fp: Path
+        """
+        self.fp = fp
+        self.samples = self._load()
+        # The runs not saved yet
+        self._recorded = {}
+        self._lock = threading.Lock()
+        self._file_lock = FileLock(self.fp.with_suffix('.lock'))
+
+    def _load(self) -> dict[str, list[list[float]]]:
+        return json.load(open(self.fp)) if self.fp.is_file() else {}
+
+    def record(self, backend: str, pixels: int, seconds: float):
+        with self._lock:
+            for runs in (self.samples, self._recorded):
+                samples = runs.setdefault(backend, [])
+                samples.append([pixels, seconds])
+                del samples[:-STATS_WINDOW]
+
+    def save(self):
+        with self._file_lock, self._lock:
+            samples = self._load()
+            for backend, recorded in self._recorded.items():
+                merged = samples.setdefault(backend, [])
+                merged.extend(recorded)
+                del merged[:-STATS_WINDOW]
+            atomic_json_dump(samples, self.fp)
+            self.samples = samples
+            self._recorded = {}
+
+    def model(self, backend: str) -> tuple[float, float] | None:
+        """
+        Fit the run time of a backend on its recorded runs.
+
+        :param backend: The backend
+        :type backend: str
+        :return: The fixed overhead in seconds and the seconds per pixel or None if it has never been run
+        :rtype: tuple[float, float] | None
+        """
+        with self._lock:
+            samples = list(self.samples.get(backend, []))
+        if len(samples) == 0:
+            return None
+        pixels = [p for p, _ in samples]
+        seconds = [s for _, s in samples]
+        if len(set(pixels)) > 1:
+            slope, intercept = statistics.linear_regression(pixels, seconds)
+            if slope > 0:
+                return max(0.0, intercept), slope
+        return 0.0, statistics.median(s / max(1, p) for p, s in samples)
+
+    def predict(self, backend: str, pixels: int) -> float | None:
+        model = self.model(backend)
+        if model is None:
+            return None
+        intercept, slope = model
+        return intercept + slope * pixels
+
+    def plan(self, backends: list[str], pixels: int, budget: float = None) -> list[tuple[str, float]]:
+        """
+        Plan the runs of backends on an image.
+
+        :param backends: The backends to run
+        :type backends: list[str]
+        :param pixels: The number of pixels of the image
+        :type pixels: int
+        :param budget: The latency budget in seconds (default: None = run all backends on the full image)
+        :type budget: float
+        :return: The backends to run with the factor to scale the sides of the image by, the fastest first
+        :rtype: list[tuple[str, float]]
+        """
+        planned = []
+        skipped = []
+        for backend in backends:
+            model = self.model(backend)
+            if model is None:
+                # Run it on the full image to learn its cost
+                planned.append((math.inf, backend, 1.0))
+                continue
+            intercept, slope = model
+            cost = intercept + slope * pixels
+            if budget is None or cost <= budget:
+                planned.append((cost, backend, 1.0))
+                continue
+            scale = math.sqrt((budget - intercept) / (slope * pixels)) if budget > intercept else 0.0
+            if scale >= MIN_SCALE:
+                planned.append((budget, backend, scale))
+            else:
+                skipped.append((intercept + slope * pixels * MIN_SCALE ** 2, backend, MIN_SCALE))
+        if len(planned) == 0 and len(skipped) > 0:
+            # Always deliver at least one color scheme
+            planned.append(min(skipped))
+        return [(backend, scale) for _, backend, scale in sorted(planned, key=lambda p: p[0])]
@@ -0,0 +1,84 @@
+import numpy as np
+
+from themur.colorspace import rgb_to_lab, ciede2000, relative_luminance
+
+# Indices into the colors in the order of `ColorScheme.to_array`
+BACKGROUND = 16
+FOREGROUND = 17
+ACCENTS = slice(1, 8)
+
+# Values at which a metric counts as fully satisfied
+TARGET_CONTRAST = 7.0  # WCAG AAA for normal text
+TARGET_SEPARATION = 20.0
+
+DEFAULT_WEIGHTS = {
+    'contrast': 1.0,
+    'separation': 1.0,
+    'layout': 0.5,
+}
+
+_PAIRS = np.triu_indices(ACCENTS.stop - ACCENTS.start, k=1)
+
+
+def score_metrics(colors: np.ndarray, reference: np.ndarray) -> dict[str, np.ndarray]:
+    """
+    Rate many color schemes at once.
+
+    - contrast: the WCAG contrast ratio between background and foreground, from 1 to 21
+    - separation: the smallest CIEDE2000 difference between any two of the colors 1 to 7
+    - layout: the mean hue difference in degrees of the colors 1 to 7 to the ones of the reference, from 0 to 180
+
+    :param colors: The colors of the color schemes in the order of `ColorScheme.to_array`, of shape (schemes, 19, 3)
+    :type colors: np.ndarray
+    :param reference: The colors of the reference color scheme, of shape (19, 3)
+    :type reference: np.ndarray
+    :return: The metrics per color scheme
+    :rtype: dict[str, np.ndarray]
+    """
+    luminance = relative_luminance(colors[:, [BACKGROUND, FOREGROUND]])
+    lighter = luminance.max(axis=-1)
+    darker = luminance.min(axis=-1)
+    contrast = (lighter + 0.05) / (darker + 0.05)
+
+    lab = rgb_to_lab(colors[:, ACCENTS])
+    separation = ciede2000(lab[:, _PAIRS[0]], lab[:, _PAIRS[1]]).min(axis=-1)
+
+    ref_lab = rgb_to_lab(reference[ACCENTS])
+    hue = np.degrees(np.arctan2(lab[..., 2], lab[..., 1]))
+    ref_hue = np.degrees(np.arctan2(ref_lab[..., 2], ref_lab[..., 1]))
+    diff = np.abs(hue - ref_hue) % 360
+    layout = np.minimum(diff, 360 - diff).mean(axis=-1)
+    return {
+        'contrast': contrast,
+        'separation': separation,
+        'layout': layout,
+    }
+
+
+def score(colors: np.ndarray, reference: np.ndarray, weights: dict[str, float] = None) -> np.ndarray:
+    """
+    Score many color schemes at once, each metric normalized between 0 (worst) and 1 (best).
+
+    :param colors: The colors of the color schemes in the order of `ColorScheme.to_array`, of shape (schemes, 19, 3)
+    :type colors: np.ndarray
+    :param reference: The colors of the reference color scheme, of shape (19, 3)
+    :type reference: np.ndarray
+    :param weights: The weight per metric, the ones not given are taken from `DEFAULT_WEIGHTS`
+    :type weights: dict[str, float]
+    :return: The scores between 0 and 1 per color scheme
+    :rtype: np.ndarray
+    """
+    unknown = set(weights or {}) - set(DEFAULT_WEIGHTS)
+    if len(unknown) > 0:
+        raise ValueError(f"Unknown score weights {sorted(unknown)}, expected some of {list(DEFAULT_WEIGHTS)}")
+    weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+    total = sum(weights.values())
+    if total <= 0:
+        raise ValueError(f"The score weights {weights} have to sum up to more than 0")
+    metrics = score_metrics(colors, reference)
+    normalized = {
+        'contrast': np.clip((metrics['contrast'] - 1) / (TARGET_CONTRAST - 1), 0, 1),
+        'separation': np.clip(metrics['separation'] / TARGET_SEPARATION, 0, 1),
+        'layout': 1 - metrics['layout'] / 180,
+    }
+    return sum(normalized[name] * weight for name, weight in weights.items()) / total
@@ -0,0 +1,70 @@
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+from PIL.Image import Image
+
+
+class SharedImage:
+    """
+    RGB pixels of an image decoded once into shared memory
+
+    Other processes attach to it by its handle and get a NumPy view of the same memory, so no process has to decode the
+    image again nor hold a copy of it.
+    """
+    shm: SharedMemory
+    shape: tuple[int, int, int]
+    owner: bool
+
+    def __init__(self, shm: SharedMemory, shape: tuple[int, int, int], owner: bool):
+        self.shm = shm
+        self.shape = shape
+        self.owner = owner
+
+    @staticmethod
+    def create(img: Image) -> 'SharedImage':
+        """
+        Decode an image into shared memory.
+
+        :param img: The image to decode
+        :type img: Image
+        :return: The shared image, which has to be closed by its owner to free the memory
+        :rtype: SharedImage
+        """
+        img = img.convert('RGB')
+        shape = (img.height, img.width, 3)
+        shm = SharedMemory(create=True, size=img.height * img.width * 3)
+        shared = SharedImage(shm, shape, True)
+        shared.array()[...] = np.asarray(img)
+        return shared
+
+    @staticmethod
+    def attach(handle: tuple[str, tuple[int, int, int]]) -> 'SharedImage':
+        """
+        Attach to an image shared by the current process or its parent.
+
+        :param handle: The handle of the shared image
+        :type handle: tuple[str, tuple[int, int, int]]
+        :return: The shared image
+        :rtype: SharedImage
+        """
+        name, shape = handle
+        shm = SharedMemory(name=name)
+        return SharedImage(shm, tuple(shape), False)
+
+    @property
+    def handle(self) -> tuple[str, tuple[int, int, int]]:
+        return self.shm.name, self.shape
+
+    def array(self) -> np.ndarray:
+        return np.ndarray(self.shape, dtype=np.uint8, buffer=self.shm.buf)
+
+    def close(self):
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+    def __enter__(self) -> 'SharedImage':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
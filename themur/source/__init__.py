@@ -1,3 +1,3 @@
-from themur.source.common import Source, InternetSource
+from themur.source.common import Source, InternetSource, AsyncSource
 from themur.source.local import LocalSource
 from themur.source.picsum_lorem import PicsumLorem
@@ -0,0 +1,200 @@
+import json
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import PIL.Image as PImage
+from PIL.Image import Image
+
+from themur.lock import FileLock, atomic_write, atomic_json_dump
+
+DEFAULT_CACHE_BUDGET = 1024 ** 3
+CACHE_POLICIES = ('lru', 'lfu')
+
+_caches: dict[Path, 'ImageCache'] = {}
+
+
+def get_image_cache(root: Path, budget: int = None, policy: str = None) -> 'ImageCache':
+    """
+    Get the image cache of a directory, shared by all sources caching into it.
+
+    :param root: The cache directory
+    :type root: Path
+    :param budget: The maximum number of bytes to keep (default: the current or 1 GiB)
+    :type budget: int
+    :param policy: The eviction policy, either 'lru' or 'lfu' (default: the current or 'lru')
+    :type policy: str
+    :return: The image cache
+    :rtype: ImageCache
+    """
+    root = root.absolute()
+    if root not in _caches:
+        _caches[root] = ImageCache(root)
+    cache = _caches[root]
+    if budget is not None:
+        cache.budget = budget
+    if policy is not None:
+        if policy not in CACHE_POLICIES:
+            raise ValueError(f"Unknown cache policy '{policy}', expected one of {CACHE_POLICIES}")
+        cache.policy = policy
+    return cache
+
+
+class ImageCache:
+    """
+    Disk-usage bounded cache for the images of the sources and their meta information
+
+    Sizes, access times and hits are kept in an index, so neither lookups nor evictions need a directory scan.
+    Pinned entries (i.e. the ones in the history) are never evicted.
+    The index is locked while it is updated and all files are written atomically, so several processes can share it.
+    """
+    root: Path
+    budget: int
+    policy: str
+    index_fp: Path
+    index: dict[str, dict]
+    lock: FileLock
+
+    def __init__(self, root: Path, budget: int = DEFAULT_CACHE_BUDGET, policy: str = 'lru'):
+        self.root = root
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.budget = budget
+        self.policy = policy
+        self.index_fp = self.root / 'index.json'
+        self.lock = FileLock(self.root / 'index.lock')
+        with self.lock:
+            if self.index_fp.is_file():
+                self.index = json.load(open(self.index_fp))
+            else:
+                self.index = self._scan()
+                atomic_json_dump(self.index, self.index_fp)
+
+    @property
+    def size(self) -> int:
+        return sum(entry['size'] for entry in self.index.values())
+
+    def put(self, img: Image, path: Path, meta: dict) -> Path:
+        """
+        Cache an image and its meta information and evict other entries if the budget is exceeded.
+
+        The new entry itself is never evicted by its own insertion, so the returned path is always valid, even if it
+        alone exceeds the budget (it is evicted by a later insertion then).
+
+        :param img: The image to cache
+        :type img: Image
+        :param path: The path of the image relative to the cache directory
+        :type path: Path
+        :param meta: The meta information to store alongside
+        :type meta: dict
+        :return: The absolute path of the cached image
+        :rtype: Path
+        """
+        file_path = self.root / path
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        # Images loaded from the cache itself do not have to be written again
+        if getattr(img, 'filename', None) != str(file_path.absolute()) or not file_path.is_file():
+            img_format = img.format or PImage.registered_extensions()[file_path.suffix.lower()]
+            atomic_write(file_path, lambda f: img.save(f, format=img_format), binary=True)
+        atomic_json_dump(meta, file_path.with_suffix('.json'))
+        key = str(path)
+        with self._updating():
+            entry = self.index.get(key, {'hits': 0, 'pinned': False})
+            entry['size'] = file_path.stat().st_size + file_path.with_suffix('.json').stat().st_size
+            entry['atime'] = time.time()
+            entry['hits'] += 1
+            self.index[key] = entry
+            self.evict(keep=key)
+        return file_path.absolute()
+
+    def get(self, path: Path) -> Path | None:
+        """
+        Look up a cached image and mark it as used.
+
+        :param path: The path of the image, relative to the cache directory or absolute
+        :type path: Path
+        :return: The absolute path of the cached image or None if it is not cached
+        :rtype: Path | None
+        """
+        key = self._key(path)
+        with self._updating():
+            if key not in self.index:
+                return None
+            entry = self.index[key]
+            entry['atime'] = time.time()
+            entry['hits'] += 1
+        return (self.root / key).absolute()
+
+    def pin(self, path: Path):
+        self._set_pinned(path, True)
+
+    def unpin(self, path: Path):
+        self._set_pinned(path, False)
+
+    def evict(self, keep: str = None):
+        """
+        Remove unpinned entries until the cache fits into its budget again.
+
+        Must be called while the index is being updated.
+
+        :param keep: The key of an entry not to remove (i.e. the one just inserted)
+        :type keep: str
+        """
+        if self.policy == 'lfu':
+            def rank(item):
+                return item[1]['hits'], item[1]['atime']
+        else:
+            def rank(item):
+                return item[1]['atime']
+        size = self.size
+        candidates = sorted(((key, entry) for key, entry in self.index.items()
+                             if not entry['pinned'] and key != keep), key=rank)
+        for key, entry in candidates:
+            if size <= self.budget:
+                break
+            file_path = self.root / key
+            file_path.unlink(missing_ok=True)
+            file_path.with_suffix('.json').unlink(missing_ok=True)
+            del self.index[key]
+            size -= entry['size']
+
+    def _set_pinned(self, path: Path, pinned: bool):
+        key = self._key(path)
+        with self._updating():
+            if key in self.index:
+                self.index[key]['pinned'] = pinned
+
+    def _key(self, path: Path) -> str:
+        path = Path(path)
+        if path.is_absolute():
+            try:
+                path = path.relative_to(self.root)
+            except ValueError:
+                return str(path)
+        return str(path)
+
+    def _scan(self) -> dict[str, dict]:
+        # Only needed once, to adopt the images cached before there was an index
+        index = {}
+        for meta_fp in self.root.rglob('*.json'):
+            if meta_fp == self.index_fp:
+                continue
+            for file_path in meta_fp.parent.glob(f"{meta_fp.stem}.*"):
+                if file_path == meta_fp:
+                    continue
+                stat = file_path.stat()
+                index[str(file_path.relative_to(self.root))] = {
+                    'size': stat.st_size + meta_fp.stat().st_size,
+                    'atime': stat.st_atime,
+                    'hits': 0,
+                    'pinned': False,
+                }
+        return index
+
+    @contextmanager
+    def _updating(self):
+        # Other processes might have changed the index in the meantime
+        with self.lock:
+            if self.index_fp.is_file():
+                self.index = json.load(open(self.index_fp))
+            yield
+            atomic_json_dump(self.index, self.index_fp)
@@ -1,4 +1,4 @@
-import json
+import asyncio
 from abc import ABC
 from pathlib import Path
 from typing import Tuple
@@ -9,11 +9,17 @@ from PIL import ExifTags
 from PIL.Image import Image
 from PIL.TiffImagePlugin import IFDRational
 from requests import Session
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry, Url
+
+from themur.source.cache import ImageCache, get_image_cache
+from themur.source.decode import fit_image
 
 
 class Source(ABC):
     cache_home: Path
     cache_path: Path
+    cache: ImageCache
 
     def __init__(self, cache_home: Path | str):
         """
@@ -25,25 +31,30 @@ class Source(ABC):
         if isinstance(cache_home, str):
             cache_home = Path(cache_home)
         self.cache_home = cache_home
-        self.cache_path = self.cache_home / 'cached' / self.__class__.__name__
+        self.cache = get_image_cache(self.cache_home / 'cached')
+        self.cache_path = self.cache.root / self.__class__.__name__
         self.cache_path.mkdir(parents=True, exist_ok=True)
 
     @property
     def args(self) -> dict:
-        return {'cache_home': str(self.cache_path)}
+        return {'cache_home': str(self.cache_home)}
 
     def get_img(self, **kwargs) -> Tuple[Image, Path, dict]:
         """
         Get a new random image from the source.
 
-        :param kwargs: Arguments to be given to the subclass
+        :param kwargs: Arguments to be given to the subclass and optionally 'fit', the size to crop and scale the image
+            to while decoding (i.e. the resolution of the monitor)
         :type kwargs: dict
         :return: A random image, its filename and a dictionary with meta information
         :rtype: Tuple[Image, Path, dict]
         """
+        fit = kwargs.get('fit')
         img, name, meta = self._get_img(kwargs)
         exif = {}
-        for k, v in img._getexif().items():
+        # Images without EXIF data (or formats without it at all) have none
+        raw_exif = img._getexif() if hasattr(img, '_getexif') else None
+        for k, v in (raw_exif or {}).items():
             if k in ExifTags.TAGS:
                 if isinstance(v, bytes):
                     try:
@@ -54,6 +65,12 @@ class Source(ABC):
                     v = f"{v.real}+i{v.imag}"
                 exif[ExifTags.TAGS[k]] = v
         meta['exif'] = exif
+        if fit is not None:
+            # Only the fitted image gets cached and passed on
+            width, height = map(int, fit)
+            img = fit_image(img, width, height)
+            name = name.with_name(f"{name.stem}-fit{width}x{height}{name.suffix}")
+            meta['width'], meta['height'] = img.size
         fp = self._cache(img, name, meta)
         return img, fp, meta
 
@@ -86,21 +103,112 @@ class Source(ABC):
         self._pop_from_history()
         path, meta, options = self._pop_from_history()
         self._add_to_history(path, meta, options)
-        return PImage.open(self.cache_path / path), path, meta
+        return PImage.open(self.cache.get(self.cache_path / path)), path, meta
 
     def _get_img(self, options: dict) -> Tuple[Image, Path, dict]:
         raise NotImplemented('Must be overwritten')
 
     def _cache(self, img: Image, path: Path, meta: dict) -> Path:
-        file_path = self.cache_path / path
-        img.save(file_path)
-        json.dump(meta, open(file_path.with_suffix('.json'), 'w'))
-        return file_path.absolute()
+        return self.cache.put(img, Path(self.__class__.__name__) / path, meta)
 
 
 class InternetSource(Source, ABC):
     session: Session
+    scheme: str = 'https'
+    host: str
+    port: int | None = None
 
-    def __init__(self, cache_home: Path | str):
+    def __init__(self, cache_home: Path | str, host: str = None, port: int = None, scheme: str = None,
+                 pool_size: int = 10, retries: int = 3):
+        """
+        A source for images to be downloaded
+
+        :param cache_home: The cache home folder
+        :type cache_home: Path | str
+        :param host: The host to connect to instead of the default one (i.e. a local mock server)
+        :type host: str
+        :param port: The port to connect to instead of the default one
+        :type port: int
+        :param scheme: The scheme to use instead of the default one
+        :type scheme: str
+        :param pool_size: The number of keep-alive connections to keep open
+        :type pool_size: int
+        :param retries: How often to retry failed requests with exponential backoff
+        :type retries: int
+        """
         super().__init__(cache_home)
+        if host is not None:
+            self.host = host
+        if port is not None:
+            self.port = port
+        if scheme is not None:
+            self.scheme = scheme
         self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size,
+                              max_retries=Retry(total=retries, backoff_factor=0.5,
+                                                status_forcelist=(429, 500, 502, 503, 504)))
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    @property
+    def args(self) -> dict:
+        return {**super().args, 'host': self.host, 'port': self.port, 'scheme': self.scheme}
+
+    def _url(self, path: str, query: str = None) -> Url:
+        return Url(self.scheme, host=self.host, port=self.port, path=path, query=query)
+
+
+class AsyncSource:
+    """
+    Asyncio front-end for a source
+
+    The blocking calls of the source run in worker threads, bounded by a semaphore, so several images can be fetched at
+    once and other work is not blocked while waiting on the network.
+    """
+    source: Source
+    max_concurrency: int
+    _semaphore: asyncio.Semaphore
+
+    def __init__(self, source: Source, max_concurrency: int = 4):
+        """
+        :param source: The source to wrap
+        :type source: Source
+        :param max_concurrency: The maximum number of requests in flight
+        :type max_concurrency: int
+        """
+        self.source = source
+        self.max_concurrency = max_concurrency
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def get_img(self, **kwargs) -> Tuple[Image, Path, dict]:
+        """
+        Get a new random image from the source.
+
+        :param kwargs: Arguments to be given to the source
+        :type kwargs: dict
+        :return: A random image, its filename and a dictionary with meta information
+        :rtype: Tuple[Image, Path, dict]
+        """
+        async with self._semaphore:
+            return await asyncio.to_thread(self.source.get_img, **kwargs)
+
+    async def get_last(self) -> Tuple[Image, Path, dict]:
+        """
+        Get the cached image prior to the latest one.
+
+        :return: The cached image, its filename and a dictionary with meta information
+        :rtype: Tuple[Image, Path, dict]
+        """
+        async with self._semaphore:
+            return await asyncio.to_thread(self.source.get_last)
+
+    async def get_imgs(self, options: list[dict]) -> list[Tuple[Image, Path, dict]]:
+        """
+        Get several new images from the source at once.
+
+        :param options: The arguments to be given to the source, one dictionary per image
+        :type options: list[dict]
+        :return: The images, their filenames and dictionaries with meta information in the order of the options
+        :rtype: list[Tuple[Image, Path, dict]]
+        """
+        return list(await asyncio.gather(*(self.get_img(**opts) for opts in options)))
@@ -0,0 +1,50 @@
+import math
+
+import PIL.Image as PImage
+from PIL.Image import Image
+
+
+def fit_image(img: Image, width: int, height: int) -> Image:
+    """
+    Crop an image to the aspect ratio of a size and scale it down to that size while decoding.
+
+    JPEGs are decoded at the smallest fraction of their size (1/2, 1/4 or 1/8) that still covers the size, and the
+    crop is reduced by averaging whole blocks of pixels before the final resampling, so a huge image is never decoded
+    nor resampled in full. Smaller images are only cropped, never scaled up.
+
+    :param img: The image to fit, which must not have been loaded yet to benefit from the draft decoding
+    :type img: Image
+    :param width: The width to fit to
+    :type width: int
+    :param height: The height to fit to
+    :type height: int
+    :return: The fitted image
+    :rtype: Image
+    """
+    src_width, src_height = img.size
+    # The largest centered region of the same aspect ratio
+    ratio = min(src_width / width, src_height / height)
+    crop_width = min(src_width, round(width * ratio))
+    crop_height = min(src_height, round(height * ratio))
+    if ratio < 1:
+        width, height = crop_width, crop_height
+    if img.mode in ('1', 'P'):
+        # Reduction only works on full colors
+        img = img.convert('RGB')
+    left = (src_width - crop_width) // 2
+    top = (src_height - crop_height) // 2
+    if img.format == 'JPEG':
+        img.draft(img.mode, (math.ceil(src_width * width / crop_width), math.ceil(src_height * height / crop_height)))
+    # The draft might have scaled the whole image down
+    scale_x = img.width / src_width
+    scale_y = img.height / src_height
+    box = (left * scale_x, top * scale_y, (left + crop_width) * scale_x, (top + crop_height) * scale_y)
+    factor = max(1, min(int((box[2] - box[0]) // width), int((box[3] - box[1]) // height)))
+    if factor > 1:
+        reduced = img.reduce(factor, box=tuple(map(round, box)))
+        box = None
+    else:
+        reduced = img
+    if reduced.size == (width, height) and box is None:
+        return reduced
+    return reduced.resize((width, height), PImage.Resampling.LANCZOS, box=box)
@@ -0,0 +1,208 @@
+import json
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import PIL.Image as PImage
+
+from themur.lock import atomic_json_dump
+
+HASH_SIZE = 8
+DUPLICATE_DISTANCE = 6
+
+
+def dhash(fp: Path) -> tuple[int, int, int]:
+    """
+    Compute the difference hash of an image, which stays the same for resized and recompressed copies.
+
+    :param fp: The image file
+    :type fp: Path
+    :return: The hash and the width and height of the image
+    :rtype: tuple[int, int, int]
+    """
+    with PImage.open(fp) as img:
+        width, height = img.size
+        # Lets JPEGs be decoded at a fraction of their size
+        img.draft('L', ((HASH_SIZE + 1) * 4, HASH_SIZE * 4))
+        pixels = img.convert('L').resize((HASH_SIZE + 1, HASH_SIZE), PImage.Resampling.BILINEAR).tobytes()
+    value = 0
+    for row in range(HASH_SIZE):
+        for col in range(HASH_SIZE):
+            left = pixels[row * (HASH_SIZE + 1) + col]
+            right = pixels[row * (HASH_SIZE + 1) + col + 1]
+            value = (value << 1) | int(left > right)
+    return value, width, height
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+class BKTree:
+    """
+    Burkhard-Keller tree for finding all hashes within a Hamming distance without comparing against every one
+    """
+    root: tuple[int, list, dict[int, tuple]] | None
+
+    def __init__(self):
+        self.root = None
+
+    def add(self, value: int, item):
+        if self.root is None:
+            self.root = (value, [item], {})
+            return
+        node = self.root
+        while True:
+            node_value, items, children = node
+            dist = hamming(value, node_value)
+            if dist == 0:
+                items.append(item)
+                return
+            if dist not in children:
+                children[dist] = (value, [item], {})
+                return
+            node = children[dist]
+
+    def search(self, value: int, radius: int) -> list:
+        found = []
+        stack = [self.root] if self.root is not None else []
+        while len(stack) > 0:
+            node_value, items, children = stack.pop()
+            dist = hamming(value, node_value)
+            if dist <= radius:
+                found.extend(items)
+            for child_dist, child in children.items():
+                if dist - radius <= child_dist <= dist + radius:
+                    stack.append(child)
+        return found
+
+
+class HashIndex:
+    """
+    Perceptual hashes and sizes of an image library, cached by file so only new or changed images get read again
+
+    Every entry is the modification time, file size, hash (None if only the size is known yet), width and height, keyed
+    by the resolved path, so the index doesn't depend on the working directory the library is given relative to.
+    """
+    fp: Path
+    entries: dict[str, list]
+    _lock: threading.Lock
+
+    def __init__(self, fp: Path):
+        """
+        :param fp: The file to cache the hashes in
+        :type fp: Path
+        """
+        self.fp = fp
+        self.entries = json.load(open(self.fp)) if self.fp.is_file() else {}
+        self._lock = threading.Lock()
+
+    def update(self, paths: list[Path], workers: int = None):
+        """
+        Hash all images that are not in the index or changed since.
+
+        :param paths: The images of the library
+        :type paths: list[Path]
+        :param workers: The number of processes to hash with (default: the number of CPUs)
+        :type workers: int
+        """
+        keys = self._keys(paths)
+        stats = self._stats(paths)
+        with self._lock:
+            missing = [fp for fp in paths
+                       if not self._is_current(keys[fp], stats[fp]) or self.entries[keys[fp]][2] is None]
+            if len(missing) == 0:
+                return
+            with ProcessPoolExecutor(workers if workers is not None else os.cpu_count()) as pool:
+                for fp, (value, width, height) in zip(missing, pool.map(dhash, missing, chunksize=16)):
+                    self.entries[keys[fp]] = [*stats[fp], f"{value:016x}", width, height]
+            self._save()
+
+    def dimensions(self, paths: list[Path]) -> dict[Path, tuple[int, int]]:
+        """
+        Get the sizes of images, only reading the headers of the ones not in the index or changed since.
+
+        :param paths: The images of the library
+        :type paths: list[Path]
+        :return: The width and height per image
+        :rtype: dict[Path, tuple[int, int]]
+        """
+        keys = self._keys(paths)
+        stats = self._stats(paths)
+        with self._lock:
+            changed = False
+            for fp in paths:
+                if not self._is_current(keys[fp], stats[fp]):
+                    # Opening an image only reads its header
+                    with PImage.open(fp) as img:
+                        self.entries[keys[fp]] = [*stats[fp], None, img.width, img.height]
+                    changed = True
+            if changed:
+                self._save()
+            return {fp: (self.entries[keys[fp]][3], self.entries[keys[fp]][4]) for fp in paths}
+
+    def _save(self):
+        # Forget the images deleted since (and the relative keys of older indices), so the index doesn't keep growing
+        self.entries = {key: entry for key, entry in self.entries.items()
+                        if Path(key).is_absolute() and Path(key).is_file()}
+        atomic_json_dump(self.entries, self.fp)
+
+    @staticmethod
+    def _keys(paths: list[Path]) -> dict[Path, str]:
+        return {fp: str(Path(fp).resolve()) for fp in paths}
+
+    @staticmethod
+    def _stats(paths: list[Path]) -> dict[Path, list[int]]:
+        stats = {}
+        for fp in paths:
+            stat = fp.stat()
+            stats[fp] = [stat.st_mtime_ns, stat.st_size]
+        return stats
+
+    def _is_current(self, key: str, stat: list[int]) -> bool:
+        entry = self.entries.get(key)
+        return entry is not None and entry[:2] == stat
+
+    def clusters(self, paths: list[Path], max_distance: int = DUPLICATE_DISTANCE) -> list[list[Path]]:
+        """
+        Group the images into clusters of near-duplicates.
+
+        :param paths: The images to group, which have to be in the index
+        :type paths: list[Path]
+        :param max_distance: The maximum Hamming distance between the hashes of near-duplicates
+        :type max_distance: int
+        :return: The clusters
+        :rtype: list[list[Path]]
+        """
+        keys = self._keys(paths)
+        tree = BKTree()
+        hashes = {}
+        for fp in paths:
+            hashes[fp] = int(self.entries[keys[fp]][2], 16)
+            tree.add(hashes[fp], fp)
+        clustered = set()
+        clusters = []
+        for fp in paths:
+            if fp in clustered:
+                continue
+            cluster = [other for other in tree.search(hashes[fp], max_distance) if other not in clustered]
+            clustered.update(cluster)
+            clusters.append(cluster)
+        return clusters
+
+    def representatives(self, paths: list[Path], max_distance: int = DUPLICATE_DISTANCE) -> list[Path]:
+        """
+        Collapse the near-duplicates to the image with the highest resolution of each cluster.
+
+        :param paths: The images of the library
+        :type paths: list[Path]
+        :param max_distance: The maximum Hamming distance between the hashes of near-duplicates
+        :type max_distance: int
+        :return: One image per cluster
+        :rtype: list[Path]
+        """
+        self.update(paths)
+        keys = self._keys(paths)
+        return [max(cluster, key=lambda fp: self.entries[keys[fp]][3] * self.entries[keys[fp]][4])
+                for cluster in self.clusters(paths, max_distance)]
@@ -1,4 +1,5 @@
 import random
+import threading
 from pathlib import Path
 from typing import Tuple
 
@@ -6,6 +7,7 @@ import PIL.Image as PImage
 from PIL.Image import Image
 
 from themur.source.common import Source
+from themur.source.dedup import HashIndex, DUPLICATE_DISTANCE
 
 
 class LocalSource(Source):
@@ -13,12 +15,24 @@ class LocalSource(Source):
     Image source for local files
     """
     path: Path
+    _hash_index: HashIndex | None
+    _hash_index_lock: threading.Lock
 
     def __init__(self, path: Path | str, cache_home: Path | str):
         super().__init__(cache_home)
         if isinstance(path, str):
             path = Path(path)
         self.path = path
+        self._hash_index = None
+        self._hash_index_lock = threading.Lock()
+
+    @property
+    def hash_index(self) -> HashIndex:
+        # Images might be picked from several threads (i.e. one per monitor)
+        with self._hash_index_lock:
+            if self._hash_index is None:
+                self._hash_index = HashIndex(self.cache_home / 'phash.json')
+            return self._hash_index
 
     @property
     def args(self) -> dict:
@@ -29,8 +43,23 @@ class LocalSource(Source):
         img_paths = list(self.path.rglob(f'*{suffix}'))
         if len(img_paths) == 0:
             raise Exception(f"No files found in {self.path} with '{suffix}' suffix")
-        img_path = random.choice(list(self.path.rglob(f'*{suffix}')))
-        img = PImage.open(open(img_path))
+        dedup = options.get('dedup')
+        if dedup:
+            # Pick among clusters of near-duplicates instead of files, so copies aren't picked more often
+            max_distance = DUPLICATE_DISTANCE if dedup is True else int(dedup)
+            img_paths = self.hash_index.representatives(img_paths, max_distance)
+        aspect = options.get('aspect')
+        if aspect is not None:
+            # Prefer images fitting the monitor, but still take any if none does
+            tolerance = float(options.get('aspect_tolerance', 0.1))
+            # The sizes are indexed, so only new or changed files are opened
+            sizes = self.hash_index.dimensions(img_paths)
+            fitting = [fp for fp in img_paths
+                       if abs(sizes[fp][0] / sizes[fp][1] - float(aspect)) <= tolerance * float(aspect)]
+            if len(fitting) > 0:
+                img_paths = fitting
+        img_path = random.choice(img_paths)
+        img = PImage.open(img_path)
         meta = {
             'width': img.width,
             'height': img.height,
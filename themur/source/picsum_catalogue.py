@@ -0,0 +1,111 @@
+import json
+import random
+import threading
+import time
+from pathlib import Path
+
+from themur.lock import FileLock, atomic_json_dump
+from themur.source.common import InternetSource
+
+CATALOGUE_TTL = 7 * 24 * 60 * 60
+CATALOGUE_PAGE_LIMIT = 100
+
+
+class PicsumCatalogue:
+    """
+    Locally cached catalogue of the Picsum Lorem image metadata (id, author, width, height, url and download_url)
+
+    The catalogue is fetched in bulk through the list API and refreshed in the background once it is older than its TTL.
+    The first fetch is locked, so threads and processes needing it at the same time wait for a single download.
+    """
+    source: InternetSource
+    fp: Path
+    ttl: float
+    entries: dict[str, dict]
+    fetched: float
+    lock: FileLock
+    _refresh_thread: threading.Thread | None
+
+    def __init__(self, source: InternetSource, fp: Path, ttl: float = CATALOGUE_TTL):
+        """
+        :param source: The source whose session and host to use
+        :type source: InternetSource
+        :param fp: The file to cache the catalogue in
+        :type fp: Path
+        :param ttl: The time in seconds after which the catalogue gets refreshed
+        :type ttl: float
+        """
+        self.source = source
+        self.fp = fp
+        self.ttl = ttl
+        self.entries = {}
+        self.fetched = 0.0
+        self.lock = FileLock(self.fp.with_suffix('.lock'))
+        self._refresh_thread = None
+        self._load()
+
+    def _load(self):
+        if not self.fp.is_file():
+            return
+        try:
+            with open(self.fp) as f:
+                data = json.load(f)
+            self.entries = {entry['id']: entry for entry in data['entries']}
+            self.fetched = data['fetched']
+        except (OSError, ValueError, KeyError, TypeError):
+            # A damaged catalogue is as good as none: it gets fetched again
+            self.entries = {}
+            self.fetched = 0.0
+
+    @property
+    def stale(self) -> bool:
+        return time.time() - self.fetched > self.ttl
+
+    def ensure(self):
+        """
+        Make sure the catalogue is usable.
+
+        Fetches it if there is none yet and refreshes it in the background if it is stale.
+        """
+        if len(self.entries) == 0:
+            with self.lock:
+                # Whoever waited for the lock reads the catalogue fetched in the meantime
+                self._load()
+                if len(self.entries) == 0:
+                    self.refresh()
+        elif self.stale:
+            self.refresh_in_background()
+
+    def refresh(self):
+        """
+        Fetch the whole catalogue page by page and cache it.
+        """
+        entries = {}
+        page = 1
+        while True:
+            url = self.source._url('/v2/list', f"page={page}&limit={CATALOGUE_PAGE_LIMIT}")
+            resp = self.source.session.get(url)
+            resp.raise_for_status()
+            page_entries = resp.json()
+            if len(page_entries) == 0:
+                break
+            for entry in page_entries:
+                entries[str(entry['id'])] = entry
+            if len(page_entries) < CATALOGUE_PAGE_LIMIT:
+                break
+            page += 1
+        self.entries = entries
+        self.fetched = time.time()
+        atomic_json_dump({'fetched': self.fetched, 'entries': list(self.entries.values())}, self.fp)
+
+    def refresh_in_background(self) -> threading.Thread:
+        if self._refresh_thread is None or not self._refresh_thread.is_alive():
+            self._refresh_thread = threading.Thread(target=self.refresh, daemon=True)
+            self._refresh_thread.start()
+        return self._refresh_thread
+
+    def random_id(self) -> str:
+        return random.choice(list(self.entries.keys()))
+
+    def get(self, picsum_id: str) -> dict | None:
+        return self.entries.get(str(picsum_id))
@@ -5,9 +5,12 @@ from typing import Tuple
 
 import PIL.Image as PImage
 from PIL.Image import Image
+from requests import RequestException
 from urllib3.util import Url
 
+from themur.lock import single_flight
 from themur.source.common import InternetSource
+from themur.source.picsum_catalogue import PicsumCatalogue, CATALOGUE_TTL
 
 HIGHEST_PICSUM_LOREM_ID = 1084
 
@@ -16,9 +19,15 @@ class PicsumLorem(InternetSource):
     """
     Image source utilizing the Picsum Lorem API (see https://picsum.photos/)
     """
+    host = 'picsum.photos'
+    catalogue: PicsumCatalogue
+
+    def __init__(self, cache_home: Path | str, catalogue_ttl: float = CATALOGUE_TTL, **kwargs):
+        super().__init__(cache_home, **kwargs)
+        self.catalogue = PicsumCatalogue(self, self.cache_home / 'picsum_catalogue.json', catalogue_ttl)
 
     def get_img(self, picsum_id: str = None, width: int = None, height: int = None, grayscale: bool = None,
-                blur: int = None) -> Tuple[Image, Path, dict]:
+                blur: int = None, fit: tuple[int, int] = None) -> Tuple[Image, Path, dict]:
         """
         Get a new random image from the source.
 
@@ -32,6 +41,8 @@ class PicsumLorem(InternetSource):
         :type grayscale: bool
         :param blur: Whether and how strong of a blur should be applied between 0 and 10 (default: 0 = no blur)
         :type blur: int
+        :param fit: The size to crop and scale the downloaded image to while decoding (default: None = as downloaded)
+        :type fit: tuple[int, int]
         :return: A random image, its filename and a dictionary with meta information
         :rtype: Tuple[Image, Path, dict]
         """
@@ -44,7 +55,8 @@ class PicsumLorem(InternetSource):
             'width': width,
             'height': height,
             'grayscale': grayscale,
-            'blur': blur
+            'blur': blur,
+            'fit': fit,
         })
 
     def redo_img(self, width: int = None, height: int = None, grayscale: bool = None, blur: int = None) \
@@ -76,6 +88,8 @@ class PicsumLorem(InternetSource):
         path = ""
         meta = {}
         picsum_id = options.get('picsum_id')
+        if picsum_id is None:
+            picsum_id = self._random_id()
         if height is None and width is None:
             if picsum_id is None:
                 picsum_id = str(random.randint(0, HIGHEST_PICSUM_LOREM_ID))
@@ -100,18 +114,30 @@ class PicsumLorem(InternetSource):
             else:
                 blur_str = "blur"
             query.append(blur_str)
-        url = Url("https", host="picsum.photos", path=path, query='&'.join(query))
-        resp = self.session.get(url)
-        resp.raise_for_status()
-        picsum_id = resp.headers['picsum-id']
-        img = PImage.open(io.BytesIO(resp.content))
+        query_str = ''
+        if len(query) > 0:
+            query_str = f"_{'_'.join(query)}"
+        url = self._url(path, '&'.join(query))
+        if picsum_id is None or options.get('fit') is not None:
+            # An image to fit only gets cached once it is fitted
+            img, fetched_id = self._fetch(url)
+            picsum_id = picsum_id if picsum_id is not None else fetched_id
+        else:
+            # Runs asking for the same image at the same time wait for the download in flight
+            name = Path(f"picsum_lorem_{picsum_id}-{width}x{height}{query_str}.jpg")
+            cached_fp = self.cache_path / name
+
+            def fetch_and_cache() -> Image:
+                fetched, _ = self._fetch(url)
+                return PImage.open(self.cache.put(fetched, Path(self.__class__.__name__) / name, meta))
+
+            img = single_flight(cached_fp.with_name(f".{cached_fp.name}.lock"),
+                                lambda: PImage.open(cached_fp) if cached_fp.is_file() else None,
+                                fetch_and_cache)
         suffix = {
             'JPEG': '.jpg',
             'PNG': '.png',
         }[img.format]
-        query_str = ''
-        if len(query) > 0:
-            query_str = f"_{'_'.join(query)}"
         name = f"picsum_lorem_{picsum_id}-{width}x{height}{query_str}"
 
         if len(meta) == 0:
@@ -124,8 +150,25 @@ class PicsumLorem(InternetSource):
         options['height'] = int(meta['height'])
         return img, Path(name).with_suffix(suffix), meta
 
+    def _fetch(self, url: Url) -> tuple[Image, str]:
+        resp = self.session.get(url)
+        resp.raise_for_status()
+        return PImage.open(io.BytesIO(resp.content)), resp.headers['picsum-id']
+
+    def _random_id(self) -> str | None:
+        try:
+            self.catalogue.ensure()
+        except RequestException:
+            pass
+        if len(self.catalogue.entries) == 0:
+            return None
+        return self.catalogue.random_id()
+
     def _get_info(self, picsum_id: str) -> dict:
-        url = Url("https", host="picsum.photos", path=f"/id/{picsum_id}/info")
+        entry = self.catalogue.get(picsum_id)
+        if entry is not None:
+            return dict(entry)
+        url = self._url(f"/id/{picsum_id}/info")
         resp2 = self.session.get(url)
         resp2.raise_for_status()
         return resp2.json()
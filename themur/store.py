@@ -0,0 +1,150 @@
+import hashlib
+import sqlite3
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from themur.colorscheme import ColorScheme, SCHEME_COLORS
+from themur.lock import FileLock
+
+ROW_SIZE = SCHEME_COLORS * 3
+
+
+class SchemeStore:
+    """
+    Compact store for many color schemes
+
+    The colors of all schemes are appended to one flat file of RGB bytes, in the order of `ColorScheme.to_array`, which
+    is memory mapped as a single array of shape (schemes, 19, 3). A SQLite index maps the keys of the schemes to their
+    rows and keeps their metadata, so loading thousands of schemes neither opens nor parses a file per scheme.
+    A key is only ever stored once, as the same key always stands for the same result.
+    """
+    root: Path
+    colors_fp: Path
+    index_fp: Path
+    lock: FileLock
+    _local: threading.local
+
+    def __init__(self, root: Path):
+        """
+        :param root: The directory to keep the store in
+        :type root: Path
+        """
+        self.root = root
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.colors_fp = self.root / 'colors.u8'
+        self.colors_fp.touch()
+        self.index_fp = self.root / 'index.sqlite'
+        self.lock = FileLock(self.root / 'store.lock')
+        self._local = threading.local()
+        with self._db() as db:
+            db.execute('CREATE TABLE IF NOT EXISTS schemes '
+                       '(key TEXT PRIMARY KEY, row INTEGER NOT NULL, wallpaper TEXT, alpha TEXT)')
+
+    def _db(self) -> sqlite3.Connection:
+        # SQLite connections can not be shared between threads
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = self._local.db = sqlite3.connect(self.index_fp, timeout=10)
+        return db
+
+    def __len__(self) -> int:
+        return self._db().execute('SELECT COUNT(*) FROM schemes').fetchone()[0]
+
+    def array(self) -> np.ndarray:
+        """
+        Map the colors of all rows, including ones whose key got replaced since.
+
+        :return: The colors as a read-only array of shape (rows, 19, 3)
+        :rtype: np.ndarray
+        """
+        rows = self.colors_fp.stat().st_size // ROW_SIZE
+        if rows == 0:
+            return np.empty((0, SCHEME_COLORS, 3), dtype=np.uint8)
+        return np.memmap(self.colors_fp, dtype=np.uint8, mode='r', shape=(rows, SCHEME_COLORS, 3))
+
+    def append(self, keys: list[str], schemes: list[ColorScheme]) -> list[int]:
+        """
+        Add color schemes to the store, keeping the ones already stored by the same keys.
+
+        :param keys: The keys to store the color schemes by
+        :type keys: list[str]
+        :param schemes: The color schemes
+        :type schemes: list[ColorScheme]
+        :return: The rows of the color schemes in `array`
+        :rtype: list[int]
+        """
+        if len(schemes) == 0:
+            return []
+        with self.lock:
+            stored = {key: row for key, (row, _, _) in self._lookup(keys).items()}
+            new = {}
+            for key, scheme in zip(keys, schemes):
+                if key not in stored:
+                    new.setdefault(key, scheme)
+            if len(new) > 0:
+                with open(self.colors_fp, 'ab') as f:
+                    # Drop a partial row left behind by a crash
+                    f.truncate(f.tell() - f.tell() % ROW_SIZE)
+                    start = f.tell() // ROW_SIZE
+                    f.write(ColorScheme.stack(list(new.values())).tobytes())
+                stored.update(zip(new.keys(), range(start, start + len(new))))
+                with self._db() as db:
+                    db.executemany('INSERT OR IGNORE INTO schemes VALUES (?, ?, ?, ?)',
+                                   [(key, stored[key], str(scheme.data.get('wallpaper', 'None')),
+                                     str(scheme.data.get('alpha', '100')))
+                                    for key, scheme in new.items()])
+        return [stored[key] for key in keys]
+
+    def load(self, keys: list[str] = None) -> list[ColorScheme | None]:
+        """
+        Load many color schemes at once.
+
+        :param keys: The keys of the color schemes (default: all in the order they were added)
+        :type keys: list[str]
+        :return: The color schemes, None for the keys not in the store
+        :rtype: list[ColorScheme | None]
+        """
+        db = self._db()
+        if keys is None:
+            entries = db.execute('SELECT row, wallpaper, alpha FROM schemes ORDER BY row').fetchall()
+        else:
+            found = self._lookup(keys)
+            entries = [found.get(key) for key in keys]
+        present = [entry for entry in entries if entry is not None]
+        if len(present) == 0:
+            return [None] * len(entries)
+        rows, wallpapers, alphas = zip(*present)
+        loaded = iter(ColorScheme.from_arrays(self.array()[list(rows)], wallpapers, alphas))
+        return [next(loaded) if entry is not None else None for entry in entries]
+
+    def _lookup(self, keys: list[str]) -> dict[str, tuple[int, str, str]]:
+        db = self._db()
+        found = {}
+        # Stay below the limit of SQL variables
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            found.update((key, (row, wallpaper, alpha)) for key, row, wallpaper, alpha in db.execute(
+                f"SELECT key, row, wallpaper, alpha FROM schemes WHERE key IN ({','.join('?' * len(chunk))})", chunk))
+        return found
+
+    def get(self, key: str) -> ColorScheme | None:
+        return self.load([key])[0]
+
+    def put(self, key: str, scheme: ColorScheme):
+        self.append([key], [scheme])
+
+    def has(self, key: str) -> bool:
+        return self._db().execute('SELECT 1 FROM schemes WHERE key = ?', (key,)).fetchone() is not None
+
+    def lock_fp(self, key: str) -> Path:
+        """
+        Get the lock file to hold while computing the color scheme of a key, so it is computed only once.
+
+        :param key: The key of the color scheme
+        :type key: str
+        :return: The lock file
+        :rtype: Path
+        """
+        return self.root / 'locks' / f"{hashlib.sha1(key.encode()).hexdigest()}.lock"
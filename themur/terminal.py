@@ -0,0 +1,171 @@
+import fcntl
+import json
+import os
+import re
+import select
+import struct
+import sys
+import termios
+import time
+import tty
+from pathlib import Path
+
+from themur.lock import atomic_json_dump
+
+PROBE_TIMEOUT = 0.2
+
+QUERY_CURSOR_POS = b"\x1b[6n"
+QUERY_CELL_SIZE = b"\x1b[16t"
+# Set a truecolor background and ask the terminal which one it has set, then reset it again
+QUERY_TRUECOLOR = b"\x1b[48;2;1;2;3m\x1bP$qm\x1b\\\x1b[m"
+QUERY_KITTY_GRAPHICS = b"\x1b_Gi=31,s=1,v=1,a=q,t=d,f=24;AAAA\x1b\\"
+# Every terminal answers the primary device attributes, so its reply marks the end of all others
+QUERY_DEVICE_ATTRIBUTES = b"\x1b[c"
+
+CURSOR_POS_PATTERN = re.compile(rb"\x1b\[(\d+);(\d+)R")
+CELL_SIZE_PATTERN = re.compile(rb"\x1b\[6;(\d+);(\d+)t")
+TRUECOLOR_PATTERN = re.compile(rb"\x1bP1\$r([^\x1b]*)m")
+KITTY_GRAPHICS_PATTERN = re.compile(rb"\x1b_Gi=31;OK")
+DEVICE_ATTRIBUTES_PATTERN = re.compile(rb"\x1b\[\?([\d;]*)c")
+
+
+def get_cell_size() -> tuple[int, int] | None:
+    """
+    Get the size of a terminal cell in pixels from the window size the terminal reports (TIOCGWINSZ).
+
+    :return: The width and height of a cell or None if the terminal does not report its size in pixels
+    :rtype: tuple[int, int] | None
+    """
+    try:
+        rows, columns, width, height = struct.unpack('HHHH', fcntl.ioctl(sys.stdout.fileno(), termios.TIOCGWINSZ,
+                                                                         b'\0' * 8))
+    except (OSError, ValueError):
+        return None
+    if rows == 0 or columns == 0 or width == 0 or height == 0:
+        return None
+    return width // columns, height // rows
+
+
+def terminal_id() -> str:
+    """
+    Identify the kind of terminal the process runs in, as far as the environment tells.
+
+    :return: The $TERM and the terminal program and version, if known
+    :rtype: str
+    """
+    parts = [os.environ.get('TERM', '')]
+    for var in ('TERM_PROGRAM', 'TERM_PROGRAM_VERSION', 'VTE_VERSION', 'KONSOLE_VERSION'):
+        if var in os.environ:
+            parts.append(f"{var}={os.environ[var]}")
+    return ':'.join(parts)
+
+
+class Terminal:
+    """
+    Probes the terminal with escape sequence queries without ever blocking for longer than a deadline
+
+    All queries are sent in one write and the replies are read with select until the terminal answers the device
+    attributes query or the deadline passes. The detected capabilities (cell size, truecolor, sixel and kitty graphics
+    support) are cached per kind of terminal, so later probes only ask for the cursor position.
+    """
+    cache_fp: Path | None
+    timeout: float
+    key: str
+    capabilities: dict | None
+
+    def __init__(self, cache_fp: Path = None, timeout: float = PROBE_TIMEOUT):
+        """
+        :param cache_fp: The file to cache the capabilities in between runs (default: memory only)
+        :type cache_fp: Path
+        :param timeout: The maximum time in seconds to wait for the terminal to answer
+        :type timeout: float
+        """
+        self.cache_fp = cache_fp
+        self.timeout = timeout
+        self.key = terminal_id()
+        self.capabilities = None
+        if self.cache_fp is not None and self.cache_fp.is_file():
+            self.capabilities = json.load(open(self.cache_fp)).get(self.key)
+
+    @property
+    def cell_size(self) -> tuple[int, int] | None:
+        cell_size = get_cell_size()
+        if cell_size is None and self.capabilities is not None and self.capabilities['cell_size'] is not None:
+            cell_size = tuple(self.capabilities['cell_size'])
+        return cell_size
+
+    def probe(self) -> tuple[int, int] | None:
+        """
+        Query the cursor position and, if not known yet, the capabilities of the terminal.
+
+        :return: The row and column of the cursor (starting at 1) or None if the terminal did not answer in time
+        :rtype: tuple[int, int] | None
+        """
+        stdin = sys.stdin.fileno()
+        stdout = sys.stdout.fileno()
+        if not os.isatty(stdin) or not os.isatty(stdout):
+            return None
+        query = QUERY_CURSOR_POS
+        if self.capabilities is None:
+            query += QUERY_CELL_SIZE + QUERY_TRUECOLOR + QUERY_KITTY_GRAPHICS
+        query += QUERY_DEVICE_ATTRIBUTES
+        sys.stdout.flush()
+        tattr = termios.tcgetattr(stdin)
+        try:
+            tty.setcbreak(stdin, termios.TCSANOW)
+            os.write(stdout, query)
+            buf = self._read_until(stdin, DEVICE_ATTRIBUTES_PATTERN)
+        finally:
+            # Drop the answers arriving after the deadline, which would otherwise end up as input of the shell
+            termios.tcflush(stdin, termios.TCIFLUSH)
+            termios.tcsetattr(stdin, termios.TCSANOW, tattr)
+        answered = DEVICE_ATTRIBUTES_PATTERN.search(buf)
+        if self.capabilities is None and answered is not None:
+            self.capabilities = self._parse_capabilities(buf, answered)
+            self._save()
+        match = CURSOR_POS_PATTERN.search(buf)
+        if match is None:
+            return None
+        return int(match.group(1)), int(match.group(2))
+
+    def _read_until(self, fd: int, pattern: re.Pattern) -> bytes:
+        buf = b''
+        deadline = time.monotonic() + self.timeout
+        while pattern.search(buf) is None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            readable, _, _ = select.select([fd], [], [], remaining)
+            if len(readable) == 0:
+                break
+            chunk = os.read(fd, 1024)
+            if len(chunk) == 0:
+                break
+            buf += chunk
+        return buf
+
+    @staticmethod
+    def _parse_capabilities(buf: bytes, device_attributes: re.Match) -> dict:
+        cell_size = None
+        match = CELL_SIZE_PATTERN.search(buf)
+        if match is not None:
+            height, width = int(match.group(1)), int(match.group(2))
+            if height > 0 and width > 0:
+                cell_size = [width, height]
+        match = TRUECOLOR_PATTERN.search(buf)
+        truecolor = match is not None and re.search(rb"1[:;]2[:;]3$", match.group(1)) is not None
+        return {
+            'cell_size': cell_size,
+            'truecolor': truecolor,
+            'sixel': '4' in device_attributes.group(1).decode().split(';'),
+            'kitty_graphics': KITTY_GRAPHICS_PATTERN.search(buf) is not None,
+        }
+
+    def _save(self):
+        if self.cache_fp is None:
+            return
+        cached = {}
+        if self.cache_fp.is_file():
+            cached = json.load(open(self.cache_fp))
+        cached[self.key] = self.capabilities
+        atomic_json_dump(cached, self.cache_fp)
@@ -0,0 +1,81 @@
+import time
+from pathlib import Path
+
+import numpy as np
+
+from themur.apply import Terminals, osc_sequences
+from themur.colorscheme import ColorScheme
+from themur.colorspace import rgb_to_lab, lab_to_rgb
+
+TRANSITION_FPS = 30
+
+
+def transition_frames(start: ColorScheme, end: ColorScheme, frames: int) -> np.ndarray:
+    """
+    Interpolate between two color schemes in L*a*b* space.
+
+    :param start: The color scheme to start from
+    :type start: ColorScheme
+    :param end: The color scheme to end with
+    :type end: ColorScheme
+    :param frames: The number of frames, the last of which is the end color scheme
+    :type frames: int
+    :return: The colors of all frames in the order of `ColorScheme.to_array`, of shape (frames, 19, 3)
+    :rtype: np.ndarray
+    """
+    start_lab = rgb_to_lab(start.to_array())
+    end_lab = rgb_to_lab(end.to_array())
+    ratios = np.linspace(1 / frames, 1, frames)[:, np.newaxis, np.newaxis]
+    rgb = lab_to_rgb(start_lab + (end_lab - start_lab) * ratios)
+    # Avoid rounding errors of the conversions on the final colors
+    rgb[-1] = end.to_array()
+    return rgb
+
+
+def frame_sequences(frames: np.ndarray) -> list[bytes]:
+    """
+    Turn the frames of a transition into the escape sequences to apply each of them.
+
+    :param frames: The colors of all frames, of shape (frames, 19, 3)
+    :type frames: np.ndarray
+    :return: The escape sequences per frame
+    :rtype: list[bytes]
+    """
+    seqs = []
+    for frame in frames:
+        hexes = [f"#{r:02X}{g:02X}{b:02X}" for r, g, b in frame.tolist()]
+        seqs.append(osc_sequences(hexes[:16], *hexes[16:]))
+    return seqs
+
+
+def transition(start: ColorScheme, end: ColorScheme, duration: float, fps: int = TRANSITION_FPS,
+               paths: list[Path] = None) -> list[Path]:
+    """
+    Fade all open terminals of the current user from one color scheme to another.
+
+    All frames are computed up front, so streaming them only costs one write per terminal and frame.
+
+    :param start: The color scheme to start from
+    :type start: ColorScheme
+    :param end: The color scheme to end with
+    :type end: ColorScheme
+    :param duration: The duration of the transition in seconds
+    :type duration: float
+    :param fps: The number of frames per second
+    :type fps: int
+    :param paths: The terminal devices to apply it to (default: all of the current user)
+    :type paths: list[Path]
+    :return: The terminals the final color scheme got applied to
+    :rtype: list[Path]
+    """
+    frames = frame_sequences(transition_frames(start, end, max(1, round(duration * fps))))
+    interval = 1 / fps
+    done = []
+    with Terminals(paths) as terminals:
+        deadline = time.monotonic()
+        for i, seqs in enumerate(frames):
+            if i > 0:
+                deadline += interval
+                time.sleep(max(0.0, deadline - time.monotonic()))
+            done = terminals.write(seqs, interval)
+    return done
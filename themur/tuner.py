@@ -0,0 +1,111 @@
+import os
+import sys
+import termios
+import tty
+from pathlib import Path
+
+from themur.api import Themur
+from themur.colorscheme import ColorScheme
+from themur.utils import color_table_str
+
+KEY_UP = '\x1b[A'
+KEY_DOWN = '\x1b[B'
+KEY_RIGHT = '\x1b[C'
+KEY_LEFT = '\x1b[D'
+KEY_SHIFT_TAB = '\x1b[Z'
+
+OFFSET_STEP = 5
+INTERPOLATE_STEP = 0.05
+
+
+class Tuner:
+    """
+    Interactive live-tuning of the post-processing parameters
+
+    Up/Down change the offset, Right/Left the interpolation ratio, Tab/Shift-Tab the backend and r toggles the
+    reordering. Enter accepts the current color scheme, q aborts.
+    """
+    themur: Themur
+    path: Path
+    backends: list[str]
+    backend_idx: int
+    offset: int
+    reorder: bool
+    interpolate: float
+
+    def __init__(self, themur: Themur, path: Path, offset: int = 0, reorder: bool = False, interpolate: float = 0.0):
+        self.themur = themur
+        self.path = path
+        self.backends = list(self.themur.backends.keys())
+        self.backend_idx = 0
+        self.offset = offset
+        self.reorder = reorder
+        self.interpolate = interpolate
+
+    @property
+    def backend(self) -> str:
+        return self.backends[self.backend_idx]
+
+    @property
+    def color_scheme(self) -> ColorScheme:
+        return self.themur.post_processing(self.path, self.backend, self.offset, self.reorder,
+                                           round(self.interpolate, 2))
+
+    def run(self) -> tuple[str, ColorScheme] | None:
+        """
+        Run the tuning loop until the user accepts or aborts.
+
+        Without a terminal to interact with (i.e. in a pipe or cron), the initial parameters are accepted right away.
+
+        :return: The chosen backend and its post-processed color scheme or None if aborted
+        :rtype: tuple[str, ColorScheme] | None
+        """
+        # Extract all raw schemes up front so every redraw only costs the post-processing
+        self.themur.get_color_schemes(self.path)
+        stdin = sys.stdin.fileno()
+        stdout = sys.stdout.fileno()
+        if not os.isatty(stdin) or not os.isatty(stdout):
+            return self.backend, self.color_scheme
+        sys.stdout.flush()
+        tattr = termios.tcgetattr(stdin)
+        try:
+            tty.setcbreak(stdin, termios.TCSANOW)
+            # Reserve the lines up front so the saved cursor position does not move when the screen scrolls
+            height = self._render().count('\n')
+            os.write(stdout, ('\x1b[?25l' + '\n' * height + f'\x1b[{height}A\x1b7').encode())
+            while True:
+                os.write(stdout, self._render().encode())
+                key = os.read(stdin, 16).decode(errors='ignore')
+                if key in ('\n', '\r'):
+                    return self.backend, self.color_scheme
+                if key in ('q', '\x1b'):
+                    return None
+                self._handle(key)
+        finally:
+            termios.tcsetattr(stdin, termios.TCSANOW, tattr)
+            os.write(stdout, b'\x1b[?25h')
+
+    def _handle(self, key: str):
+        if key == KEY_UP:
+            self.offset = min(255, self.offset + OFFSET_STEP)
+        elif key == KEY_DOWN:
+            self.offset = max(0, self.offset - OFFSET_STEP)
+        elif key == KEY_RIGHT:
+            self.interpolate = min(1.0, self.interpolate + INTERPOLATE_STEP)
+        elif key == KEY_LEFT:
+            self.interpolate = max(0.0, self.interpolate - INTERPOLATE_STEP)
+        elif key in ('\t', 'b'):
+            self.backend_idx = (self.backend_idx + 1) % len(self.backends)
+        elif key in (KEY_SHIFT_TAB, 'B'):
+            self.backend_idx = (self.backend_idx - 1) % len(self.backends)
+        elif key == 'r':
+            self.reorder = not self.reorder
+
+    def _render(self) -> str:
+        # Everything is drawn from the saved cursor position and written at once to avoid flickering
+        backends = ' '.join(f"\033[7m{b}\033[m" if b == self.backend else b for b in self.backends)
+        status = f"offset: {self.offset:3d}  interpolate: {self.interpolate:.2f}  " \
+                 f"reorder: {'on' if self.reorder else 'off'}"
+        table = color_table_str(self.color_scheme.to_256_colors())
+        lines = [backends, status, *table.rstrip('\n').split('\n')]
+        return '\x1b8' + ''.join(f"{line}\x1b[K\n" for line in lines)
@@ -1,32 +1,32 @@
 import math
-import re
-import subprocess
-import sys
-import termios
-import tty
+from functools import lru_cache
 from typing import Tuple
 
+from themur.display import get_monitors
+from themur.terminal import Terminal
+
 
 def get_monitor_resolution() -> Tuple[int, int]:
-    for line in subprocess.check_output(('xdpyinfo')).decode().split('\n'):
-        if 'dimensions:' in line:
-            left, right = line.split('x', maxsplit=1)
-            width = int(left.rsplit(' ', maxsplit=1)[-1])
-            height = int(right.split(' ', maxsplit=1)[0])
-            return width, height
-    raise Exception("Couldn't find the monitor resolution(s)")
+    monitors = get_monitors()
+    width = max(monitor.x + monitor.width for monitor in monitors)
+    height = max(monitor.y + monitor.height for monitor in monitors)
+    return width, height
 
 
 def print_color_table(colors: list[str] = None):
+    print(color_table_str(colors), end='')
+
+
+def color_table_str(colors: list[str] = None) -> str:
     if colors is None:
         colors = [*list(range(40, 48)), *list(range(100, 108))]
-    for name in ['Black', 'Red', 'Green', 'Yellow', 'Blue', 'Magenta', 'Cyan', 'White']:
-        print(name.center(9), end='')
-    print()
+    s = ''.join(name.center(9) for name in ['Black', 'Red', 'Green', 'Yellow', 'Blue', 'Magenta', 'Cyan', 'White'])
+    s += '\n'
     for row in [colors[:8], colors[8:]]:
         for el in row:
-            print(f"\033[{el}m{''.center(9)}\033[m", end='')
-        print()
+            s += f"\033[{el}m{''.center(9)}\033[m"
+        s += '\n'
+    return s
 
 
 def print_colortest(colors: list[str] = None):
@@ -438,33 +438,13 @@ def rgb2s(r: int, g: int, b: int) -> str:
     return f"#{r:02X}{g:02X}{b:02X}"
 
 
+@lru_cache(maxsize=4096)
 def rgb_to_256col_ansi(r: int, g: int, b: int) -> str:
     return f"48;5;{col256[find_closest_color(r, g, b, list(col256.keys()))]}"
 
 
-def get_cursor_pos():
-    buf = ""
-    stdin = sys.stdin.fileno()
-    try:
-        tattr = termios.tcgetattr(stdin)
-    except termios.error as e:
-        print(f"Not running in a compatible terminal: {e.args[1]}")
+def get_cursor_pos() -> Tuple[int, int] | Tuple[None, None]:
+    pos = Terminal().probe()
+    if pos is None:
         return None, None
-    try:
-        tty.setcbreak(stdin, termios.TCSANOW)
-        sys.stdout.write("\x1b[6n")
-        sys.stdout.flush()
-        while True:
-            buf += sys.stdin.read(1)
-            if buf[-1] == "R":
-                break
-    finally:
-        termios.tcsetattr(stdin, termios.TCSANOW, tattr)
-    # reading the actual values, but what if a keystroke appears while reading
-    # from stdin? As dirty work around, getpos() returns if this fails: None
-    try:
-        matches = re.match(r"^\x1b\[(\d*);(\d*)R", buf)
-        groups = matches.groups()
-    except AttributeError:
-        return None
-    return (int(groups[0]), int(groups[1]))
+    return pos